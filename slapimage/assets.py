@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import TYPE_CHECKING, Optional
+
+from slapimage.cache import Cache
+from slapimage.utils import file_hash
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+MODES = ("contain", "cover", "fill")
+
+# how far into the spare room of the box an image goes, by anchor
+CENTERING = {"l": 0.0, "m": 0.5, "r": 1.0, "a": 0.0, "d": 1.0}
+
+
+# resized images, bounded by the bytes of their pixels rather than their number, so a few huge
+# photos can't crowd out memory while many small logos stay cached
+assets = Cache("assets", max_bytes=64 << 20)
+
+
+def decode(path: str, size: tuple[int, int], mode: str) -> Image:
+    """
+    Decode an image no larger than it has to be to be resized to a box of `size` in the given mode, upright per its EXIF orientation.
+
+    JPEGs are decoded in draft mode, which scales them down by up to 8 times while decoding, at a fraction of the cost of decoding at full size.
+    """
+
+    from PIL import ExifTags, Image, ImageOps
+
+    img = Image.open(path)
+    if img.format == "JPEG":
+        w, h = img.size
+        bw, bh = size
+        rotated = img.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8)
+        if rotated:
+            bw, bh = bh, bw
+        match mode:
+            case "contain":
+                sx = sy = min(bw / w, bh / h)
+            case "cover":
+                sx = sy = max(bw / w, bh / h)
+            case "fill":
+                sx, sy = bw / w, bh / h
+        img.draft(img.mode, (math.ceil(w * sx), math.ceil(h * sy)))
+    return ImageOps.exif_transpose(img)
+
+
+def resize(img: Image, size: tuple[int, int], mode: str, anchor: str) -> Image:
+    """
+    Resize an image to a box of `size`: "contain" fits it inside, keeping its aspect ratio, "cover" fills the box, cropping what overflows on the side away from the anchor, and "fill" stretches it.
+
+    Returns:
+    `Image`: the resized image; for "contain", it may be smaller than the box along one side
+    """
+
+    from PIL import Image, ImageOps
+
+    # palette and bilevel images can only be resized by nearest neighbour
+    if img.mode in ("1", "P"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+    xa, ya = anchor
+    match mode:
+        case "contain":
+            return ImageOps.contain(img, size, Image.Resampling.LANCZOS)
+        case "cover":
+            return ImageOps.fit(
+                img,
+                size,
+                Image.Resampling.LANCZOS,
+                centering=(CENTERING[xa], CENTERING[ya]),
+            )
+        case "fill":
+            return img.resize(size, Image.Resampling.LANCZOS)
+
+
+def load(
+    path: str,
+    size: tuple[int, int],
+    mode: str = "contain",
+    anchor: str = "mm",
+    cache: Optional[Cache] = assets,
+) -> Image:
+    """
+    Load an image resized to a box of `size`, see `resize`, decoding it only if the cache doesn't have it yet.
+
+    Resized images are cached by the source's hash, the box, the mode and the anchor, so an asset reused across records, e.g. a logo, is decoded and resized once.
+    """
+
+    if mode not in MODES:
+        raise Exception(
+            f'Image mode should be "contain", "cover" or "fill", not "{mode}".',
+        )
+
+    key = (file_hash(path), size, mode, anchor)
+    if cache is not None and (img := cache.get(key)) is not None:
+        return img
+
+    start = time.perf_counter()
+    img = resize(decode(path, size, mode), size, mode, anchor)
+    if cache is not None:
+        cache.put(key, img, time.perf_counter() - start)
+    return img
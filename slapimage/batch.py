@@ -0,0 +1,321 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Any, Optional
+
+from slapimage.cache import share
+from slapimage.journal import Journal
+from slapimage.modes import output
+from slapimage.render import compile_fields, draw_fields, encode, load_template
+from slapimage.schedule import CostModel, schedule
+from slapimage.shard import parse_shard, select, write_manifest
+from slapimage.store import Store, render_key, template_hash
+from slapimage.utils import file_hash
+
+
+def load_job(path: str) -> dict[str, Any]:
+    """
+    Load a job file (YAML or JSON).
+
+    A job is a dict with:
+    - template (`str`): path to the template
+    - fields (`list[dict[str, Any]]`): field specs, see `slapimage.render.compile_fields`
+    - scale (`float | int`, optional): output scale, see `Draw.scaled`
+    - format (`str`, optional): output format, PNG by default
+    - mode (`str`, optional): output mode, see `slapimage.modes.output`
+    """
+
+    import yaml
+
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def load_records(path: str) -> list[dict[str, Any]]:
+    """Load records from a JSON list, JSON lines, CSV or XLSX (header row first) file."""
+
+    match os.path.splitext(path)[1].lower():
+        case ".json":
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        case ".jsonl":
+            with open(path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        case ".csv":
+            with open(path, encoding="utf-8", newline="") as f:
+                return list(csv.DictReader(f))
+        case ".xlsx":
+            from openpyxl import load_workbook
+
+            rows = load_workbook(path, read_only=True).active.iter_rows(
+                values_only=True,
+            )
+            header = next(rows)
+            return [dict(zip(header, row, strict=False)) for row in rows]
+        case ext:
+            raise Exception(f'Records file type "{ext}" is not supported.')
+
+
+def output_path(
+    job: dict[str, Any],
+    record: dict[str, Any],
+    out_dir: str,
+    id_key: str,
+) -> str:
+    return os.path.join(
+        out_dir,
+        f"{record[id_key]}.{job.get('format', 'PNG').lower()}",
+    )
+
+
+def render_record(
+    job: dict[str, Any],
+    record: dict[str, Any],
+    out_dir: str,
+    store: Optional[Store] = None,
+    id_key: str = "id",
+) -> dict[str, Any]:
+    """
+    Render one record of a job to `out_dir`, reusing the store's output if it has one.
+
+    The output is written under a temporary name and then renamed, so it is never left half-written.
+
+    Returns:
+    `dict[str, Any]`: the record's `id`, `output` path, the output's `sha256`, whether it was `reused`, how many `seconds` it took, and the fitting limits its fields hit as `events` (see `Draw`)
+    """
+
+    start = time.perf_counter()
+    fields = compile_fields(job["fields"], record)
+    out = output_path(job, record, out_dir, id_key)
+    fmt = job.get("format", "PNG")
+
+    if store is not None:
+        key = render_key(
+            fields,
+            template_hash(job["template"]),
+            record,
+            scale=job.get("scale", 1),
+            format=fmt,
+            **({"mode": job["mode"]} if job.get("mode") else {}),
+        )
+        if store.link(key, out):
+            return {
+                "id": record[id_key],
+                "output": out,
+                "sha256": file_hash(out),
+                "reused": True,
+                "seconds": time.perf_counter() - start,
+                "events": [],
+            }
+
+    template = load_template(job["template"])
+    draw = draw_fields(template, fields, job.get("scale", 1), job.get("mode"))
+    data = encode(output(draw.img, job.get("mode"), template), fmt)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out)
+
+    if store is not None:
+        store.put(key, out)
+    return {
+        "id": record[id_key],
+        "output": out,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "reused": False,
+        "seconds": time.perf_counter() - start,
+        "events": draw.events,
+    }
+
+
+def try_render_record(
+    job: dict[str, Any],
+    record: dict[str, Any],
+    out_dir: str,
+    store: Optional[Store] = None,
+    id_key: str = "id",
+) -> dict[str, Any]:
+    """Like `render_record`, but a record that fails returns its `id` and the `error` it raised instead, so one bad record doesn't stop a batch."""
+
+    try:
+        return render_record(job, record, out_dir, store, id_key)
+    except Exception as e:  # noqa: BLE001
+        return {"id": record[id_key], "error": f"{type(e).__name__}: {e}"}
+
+
+def sweep(out_dir: str, outputs: set[str]) -> None:
+    """
+    Remove temporary files left behind in `out_dir` by renders of the given outputs that died mid-write, see `render_record`.
+
+    Only this run's own outputs are swept: other shards writing to the same directory may be mid-write.
+    """
+
+    for name in os.listdir(out_dir):
+        if name.endswith(".tmp") and name[: -len(".tmp")].rpartition(".")[0] in outputs:
+            os.remove(os.path.join(out_dir, name))
+
+
+def run(
+    job: dict[str, Any],
+    records: Iterable[dict[str, Any]],
+    out_dir: str,
+    store: Optional[Store] = None,
+    workers: Optional[int] = 1,
+    id_key: str = "id",
+    journal: Optional[Journal] = None,
+    model: Optional[CostModel] = None,
+    shard: Optional[tuple[int, int]] = None,
+    manifest: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Render every record of a job to `out_dir`, or only those of one shard, so several machines can split a batch between them without coordinating.
+
+    Args:
+    - job (`dict[str, Any]`): see `load_job`
+    - records (`Iterable[dict[str, Any]]`): records to render, each with an ID under `id_key`
+    - out_dir (`str`): directory to write outputs to, named after the record IDs
+    - store (`Optional[Store]`): content-addressed store to reuse unchanged outputs from
+    - workers (`Optional[int]`): number of render processes; 1 renders in this process
+    - id_key (`str`): record key of the record ID
+    - journal (`Optional[Journal]`): progress journal; records it has as done, with intact outputs, are skipped
+    - model (`Optional[CostModel]`): cost model; records are then rendered longest first, and the model learns from their timings
+    - shard (`Optional[tuple[int, int]]`): (i, n), to only render the records of shard `i` of `n`, see `slapimage.shard.shard_of`
+    - manifest (`Optional[str]`): file to write the outputs to once every record is done, see `slapimage.shard.write_manifest`, for `slapimage.shard.merge` to check
+
+    Returns:
+    `dict[str, Any]`: report with the number of records, how many were rendered, reused from the store and resumed from the journal, the fitting limits hit as `events`, each with its record's `id`, and the records that `failed`, each with its `id` and `error`; every other record is journaled and in the manifest, so a resumed run only renders the failed ones again
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    report: dict[str, Any] = {
+        "records": 0,
+        "rendered": 0,
+        "reused": 0,
+        "resumed": 0,
+        "events": [],
+        "failed": [],
+    }
+    if shard is not None:
+        records = select(records, shard, id_key)
+
+    todo = []
+    outputs = []
+    owned = set()
+    for record in records:
+        report["records"] += 1
+        owned.add(os.path.basename(output_path(job, record, out_dir, id_key)))
+        if journal is not None and journal.completed(
+            record[id_key],
+            output_path(job, record, out_dir, id_key),
+        ):
+            report["resumed"] += 1
+            outputs.append(journal.done[record[id_key]])
+        else:
+            todo.append(record)
+
+    sweep(out_dir, owned)
+
+    x: dict[Any, list[float]] = {}
+    if model is not None:
+        scheduled = schedule(job, todo, model)
+        todo = [record for record, _ in scheduled]
+        x = {record[id_key]: xi for record, xi in scheduled}
+
+    fn = partial(try_render_record, job, out_dir=out_dir, store=store, id_key=id_key)
+    if workers == 1:
+        results: Iterable[dict[str, Any]] = map(fn, todo)
+    else:
+        executor = ProcessPoolExecutor(workers)
+        # each worker pulls the next record as soon as it is free
+        futures = [executor.submit(fn, record) for record in todo]
+        results = (f.result() for f in as_completed(futures))
+
+    try:
+        for result in results:
+            if "error" in result:
+                report["failed"].append(result)
+                continue
+            report["reused" if result["reused"] else "rendered"] += 1
+            report["events"] += [{"id": result["id"], **e} for e in result["events"]]
+            outputs.append({k: result[k] for k in ("id", "output", "sha256")})
+            if journal is not None:
+                journal.record(outputs[-1])
+            if model is not None and not result["reused"]:
+                model.observe(x[result["id"]], result["seconds"])
+    finally:
+        if workers != 1:
+            # on an interrupt, don't wait for renders that haven't started
+            executor.shutdown(cancel_futures=True)
+        if journal is not None:
+            journal.flush()
+
+    if model is not None:
+        model.learn()
+        model.save()
+    if manifest is not None:
+        write_manifest(manifest, shard, outputs, report)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render a batch of records.")
+    parser.add_argument("job", help="job file, see slapimage.batch.load_job")
+    parser.add_argument(
+        "records",
+        help="records file, see slapimage.batch.load_records",
+    )
+    parser.add_argument("out_dir", help="directory to write outputs to")
+    parser.add_argument("--store", help="content-addressed store directory")
+    parser.add_argument("--workers", type=int, help="number of render processes")
+    parser.add_argument("--id-key", default="id", help="record key of the record ID")
+    parser.add_argument("--journal", help="progress journal to resume from")
+    parser.add_argument("--cost-model", help="cost model file to schedule by and learn")
+    parser.add_argument(
+        "--shared-cache",
+        help="SQLite file to share measurements and fits between processes through",
+    )
+    parser.add_argument("--shard", help='only render shard "i/n", e.g. "0/4"')
+    parser.add_argument(
+        "--manifest",
+        help='file to write the outputs to, "manifest-i-of-n.json" in out_dir by default when sharding',
+    )
+    args = parser.parse_args()
+
+    if args.shared_cache:
+        share(args.shared_cache)
+
+    shard = parse_shard(args.shard) if args.shard else None
+    manifest = args.manifest
+    if manifest is None and shard is not None:
+        manifest = os.path.join(args.out_dir, f"manifest-{shard[0]}-of-{shard[1]}.json")
+
+    journal = Journal(args.journal) if args.journal else None
+    try:
+        report = run(
+            load_job(args.job),
+            load_records(args.records),
+            args.out_dir,
+            Store(args.store) if args.store else None,
+            args.workers,
+            args.id_key,
+            journal,
+            CostModel(args.cost_model) if args.cost_model else None,
+            shard,
+            manifest,
+        )
+    finally:
+        if journal is not None:
+            journal.close()
+    print(json.dumps(report))
+    raise SystemExit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
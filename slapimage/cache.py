@@ -0,0 +1,269 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import wraps
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from slapimage.shared import SharedCache
+
+# bytes all caches of a process may hold together
+DEFAULT_BUDGET = int(os.environ.get("SLAPIMAGE_CACHE_BYTES", 512 << 20))
+# SQLite file shared by the caches of every process, see `share`
+SHARED_CACHE = "SLAPIMAGE_SHARED_CACHE"
+
+
+_MISSING = object()
+
+
+class _Kwargs:
+    # marks where keyword arguments start in a key, the same in every process
+    def __repr__(self) -> str:
+        return "<kwargs>"
+
+
+_KWARGS = _Kwargs()
+
+
+def sizeof(value: Any) -> int:
+    """Approximate bytes held by a cached value: pixels for images, and contents for tuples and lists."""
+
+    if hasattr(value, "getbands"):  # an image
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, tuple | list):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CacheManager:
+    """
+    Every cache of a process, held to one memory budget.
+
+    When the caches together go over `budget` bytes, entries are evicted across all of them, each cache giving up its least recently used entry, cheapest first: the one that took the least time to compute per byte it holds.
+
+    Args:
+    - budget (`int`): bytes all caches may hold together
+    - shared (`Optional[str]`): SQLite file to back shareable caches with, see `SharedCache`
+    """
+
+    def __init__(
+        self,
+        budget: int = DEFAULT_BUDGET,
+        shared: Optional[str] = None,
+    ) -> None:
+        self.budget = budget
+        self.bytes = 0
+        self.caches: dict[str, Cache] = {}
+        self.lock = threading.RLock()
+        self.shared: Optional[SharedCache] = None
+        if shared is not None:
+            self.share(shared)
+
+    def register(self, cache: "Cache") -> None:
+        if cache.name in self.caches:
+            raise Exception(f'A cache named "{cache.name}" is already registered.')
+        self.caches[cache.name] = cache
+        if cache.shareable:
+            cache.shared = self.shared
+
+    def share(self, path: Optional[str]) -> None:
+        """Back every shareable cache with the `SharedCache` at `path`, or with none."""
+
+        # only processes that share load SQLite
+        from slapimage.shared import SharedCache
+
+        self.shared = None if path is None else SharedCache(path)
+        for cache in self.caches.values():
+            if cache.shareable:
+                cache.shared = self.shared
+
+    def enforce(self) -> None:
+        with self.lock:
+            while self.bytes > self.budget:
+                candidates = [c for c in self.caches.values() if c.items]
+                if not candidates:
+                    return
+                victim = min(candidates, key=lambda c: c.oldest_value())
+                victim.evict()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Memory use and effectiveness of every cache.
+
+        Returns:
+        `dict[str, Any]`: the `budget` and `bytes` held overall, and per cache, its number of `entries`, `bytes`, `hits`, `misses`, `hit_rate`, `evictions`, and `shared_hits`, misses answered by the shared cache
+        """
+
+        return {
+            "budget": self.budget,
+            "bytes": self.bytes,
+            "caches": {name: c.stats() for name, c in self.caches.items()},
+        }
+
+
+manager = CacheManager(shared=os.environ.get(SHARED_CACHE))
+
+
+class Cache:
+    """
+    Least recently used cache registered with a `CacheManager`, which accounts for the approximate bytes of each entry and evicts across caches to keep to its budget.
+
+    Args:
+    - name (`str`): name in the manager's stats
+    - max_entries (`Optional[int]`): most entries kept
+    - max_bytes (`Optional[int]`): most bytes kept, on top of the manager's budget
+    - sizeof (`Callable[[Any], int]`): approximate bytes held by a value
+    - shareable (`bool`): whether the manager's `SharedCache`, if any, backs this cache; values must then be picklable, and keys have the same `repr` in every process
+    - manager (`Optional[CacheManager]`): manager to register with, the process-wide one by default
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sizeof,
+        shareable: bool = False,
+        manager: Optional[CacheManager] = None,
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.shareable = shareable
+        self.shared: Optional[SharedCache] = None
+        self.manager = globals()["manager"] if manager is None else manager
+        self.items: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.shared_hits = 0
+        self.manager.register(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self.items[key][0]
+            self.items.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, cost: float = 0.0) -> None:
+        """Cache a value that took `cost` seconds to compute."""
+
+        n = self.sizeof(value)
+        with self.manager.lock:
+            self._remove(key)
+            if self.max_bytes is not None and n > self.max_bytes:
+                return
+            self.items[key] = (value, n, cost)
+            self.bytes += n
+            self.manager.bytes += n
+            while (
+                self.max_entries is not None and len(self.items) > self.max_entries
+            ) or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self.evict()
+        self.manager.enforce()
+
+    def oldest_value(self) -> float:
+        """Compute time per byte of the least recently used entry."""
+
+        _, n, cost = next(iter(self.items.values()))
+        return cost / max(n, 1)
+
+    def evict(self) -> None:
+        with self.manager.lock:
+            _, (_, n, _) = self.items.popitem(last=False)
+            self.bytes -= n
+            self.manager.bytes -= n
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self.items.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+            self.manager.bytes -= entry[1]
+
+    def clear(self) -> None:
+        with self.manager.lock:
+            self.manager.bytes -= self.bytes
+            self.items.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.items),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "shared_hits": self.shared_hits,
+        }
+
+
+def cached(
+    name: str,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    sizeof: Callable[[Any], int] = sizeof,
+    shareable: bool = False,
+    keep: Optional[Callable[[Any], bool]] = None,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Memoize a function in a `Cache` registered with the process-wide manager, like `functools.lru_cache`, recording how long each result took to compute as its eviction cost.
+
+    If the cache is shareable and the manager has a `SharedCache`, results missing from this process's cache are looked up there before being computed, and results computed are put there for other processes.
+
+    If `keep` is given, only results for which it returns true are cached, e.g. to leave out results that depend on more than the arguments.
+
+    The wrapper keeps the function as `__wrapped__`, and its cache as `cache`.
+    """
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        cache = Cache(name, max_entries, max_bytes, sizeof, shareable)
+
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = (*args, _KWARGS, *sorted(kwargs.items())) if kwargs else args
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            start = time.perf_counter()
+            shared = cache.shared
+            if shared is not None:
+                value = shared.get(name, key, _MISSING)
+                if value is not _MISSING:
+                    cache.shared_hits += 1
+                    # costs only the lookup to get back
+                    cache.put(key, value, time.perf_counter() - start)
+                    return value
+
+            value = fn(*args, **kwargs)
+            if keep is not None and not keep(value):
+                return value
+            cache.put(key, value, time.perf_counter() - start)
+            if shared is not None:
+                shared.put(name, key, value)
+            return value
+
+        wrapper.cache = cache  # type: ignore[attr-defined]
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+def share(path: Optional[str]) -> None:
+    """Share the results of shareable caches through the SQLite file at `path`, in this process and the worker processes it starts from now on, or stop sharing them if `None`."""
+
+    if path is None:
+        os.environ.pop(SHARED_CACHE, None)
+    else:
+        os.environ[SHARED_CACHE] = path
+    manager.share(path)
@@ -0,0 +1,99 @@
+from typing import Any, Optional
+
+import httpx
+
+
+def _request(
+    template: str,
+    fields: list[dict[str, Any]],
+    record: dict[str, Any],
+    **options: Any,
+) -> dict[str, Any]:
+    return {"template": template, "fields": fields, "record": record, **options}
+
+
+class Client:
+    """
+    Client of `slapimage.service`.
+
+    Args:
+    - socket (`Optional[str]`): Unix socket the service listens on
+    - url (`str`): base URL of the service, if it listens on TCP instead
+    """
+
+    def __init__(
+        self,
+        socket: Optional[str] = None,
+        url: str = "http://127.0.0.1:8000",
+    ) -> None:
+        self.http = httpx.Client(
+            base_url="http://slapimage" if socket else url,
+            transport=httpx.HTTPTransport(uds=socket) if socket else None,
+            timeout=None,
+        )
+
+    def render(
+        self,
+        template: str,
+        fields: list[dict[str, Any]],
+        record: dict[str, Any],
+        **options: Any,
+    ) -> bytes:
+        """
+        Render a record, see `slapimage.service.render_request`.
+
+        Returns:
+        `bytes`: the encoded image
+        """
+
+        r = self.http.post(
+            "/render",
+            json=_request(template, fields, record, **options),
+        )
+        r.raise_for_status()
+        return r.content
+
+    def stats(self) -> dict[str, int]:
+        r = self.http.get("/stats")
+        r.raise_for_status()
+        return r.json()
+
+    def close(self) -> None:
+        self.http.close()
+
+
+class AsyncClient:
+    """Asynchronous `Client`."""
+
+    def __init__(
+        self,
+        socket: Optional[str] = None,
+        url: str = "http://127.0.0.1:8000",
+    ) -> None:
+        self.http = httpx.AsyncClient(
+            base_url="http://slapimage" if socket else url,
+            transport=httpx.AsyncHTTPTransport(uds=socket) if socket else None,
+            timeout=None,
+        )
+
+    async def render(
+        self,
+        template: str,
+        fields: list[dict[str, Any]],
+        record: dict[str, Any],
+        **options: Any,
+    ) -> bytes:
+        r = await self.http.post(
+            "/render",
+            json=_request(template, fields, record, **options),
+        )
+        r.raise_for_status()
+        return r.content
+
+    async def stats(self) -> dict[str, int]:
+        r = await self.http.get("/stats")
+        r.raise_for_status()
+        return r.json()
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
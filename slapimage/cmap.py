@@ -0,0 +1,121 @@
+import struct
+from bisect import bisect_right
+from typing import NamedTuple
+
+from slapimage.cache import cached
+
+# cmap subtables by preference: full Unicode (format 12) before the Basic Multilingual Plane (format 4)
+SUBTABLES = ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0))
+
+
+class Coverage(NamedTuple):
+    starts: tuple[int, ...]
+    ends: tuple[int, ...]  # inclusive
+
+    def __contains__(self, cp: object) -> bool:
+        i = bisect_right(self.starts, cp) - 1  # type: ignore[arg-type]
+        return i >= 0 and cp <= self.ends[i]  # type: ignore[operator]
+
+
+def _ranges_4(data: bytes, offset: int) -> list[tuple[int, int]]:
+    (seg_x2,) = struct.unpack_from(">H", data, offset + 6)
+    n = seg_x2 // 2
+    ends = struct.unpack_from(f">{n}H", data, offset + 14)
+    starts = struct.unpack_from(f">{n}H", data, offset + 16 + seg_x2)
+    deltas = struct.unpack_from(f">{n}h", data, offset + 16 + 2 * seg_x2)
+    range_offsets_at = offset + 16 + 3 * seg_x2
+    range_offsets = struct.unpack_from(f">{n}H", data, range_offsets_at)
+
+    ranges = []
+    for i, (start, end, delta, ro) in enumerate(
+        zip(starts, ends, deltas, range_offsets, strict=True),
+    ):
+        if start == 0xFFFF:
+            continue
+        # a code point is only covered if it maps to a glyph other than .notdef
+        if ro == 0:
+            notdef = -delta & 0xFFFF
+            ranges += [
+                (s, e)
+                for s, e in (
+                    (start, min(end, notdef - 1)),
+                    (max(start, notdef + 1), end),
+                )
+                if s <= e
+            ]
+            continue
+        at = range_offsets_at + 2 * i + ro
+        glyphs = struct.unpack_from(f">{end - start + 1}H", data, at)
+        ranges += [(start + j, start + j) for j, glyph in enumerate(glyphs) if glyph]
+    return ranges
+
+
+def _ranges_12(data: bytes, offset: int) -> list[tuple[int, int]]:
+    (n,) = struct.unpack_from(">I", data, offset + 12)
+    ranges = []
+    for start, end, glyph in struct.iter_unpack(
+        ">3I",
+        data[offset + 16 : offset + 16 + 12 * n],
+    ):
+        if glyph == 0:
+            start += 1
+        if start <= end:
+            ranges.append((start, end))
+    return ranges
+
+
+@cached("coverage", max_entries=256)
+def coverage(path: str) -> Coverage:
+    """
+    Code points a font file has glyphs for, read once from its cmap table (subtable format 4 or 12) as sorted, merged ranges.
+
+    Returns:
+    `Coverage`: supports `cp in coverage(path)`
+    """
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # the first font of a collection
+    base = struct.unpack_from(">I", data, 12)[0] if data[:4] == b"ttcf" else 0
+    (n,) = struct.unpack_from(">H", data, base + 4)
+    tables = {
+        tag: offset
+        for tag, _, offset, _ in struct.iter_unpack(
+            ">4s3I",
+            data[base + 12 : base + 12 + 16 * n],
+        )
+    }
+    if b"cmap" not in tables:
+        raise Exception(f'Font "{path}" has no cmap table.')
+    cmap = tables[b"cmap"]
+
+    (n,) = struct.unpack_from(">H", data, cmap + 2)
+    subtables = {
+        (platform, encoding): cmap + offset
+        for platform, encoding, offset in struct.iter_unpack(
+            ">2HI",
+            data[cmap + 4 : cmap + 4 + 8 * n],
+        )
+    }
+
+    ranges: list[tuple[int, int]] = []
+    for key in SUBTABLES:
+        if key not in subtables:
+            continue
+        offset = subtables[key]
+        (fmt,) = struct.unpack_from(">H", data, offset)
+        if fmt == 12:
+            ranges = _ranges_12(data, offset)
+            break
+        if fmt == 4:
+            ranges = _ranges_4(data, offset)
+            break
+
+    merged: list[list[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return Coverage(tuple(s for s, _ in merged), tuple(e for _, e in merged))
@@ -1,18 +1,41 @@
-from collections.abc import Callable
-from os import path
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Hashable, Iterable
+from functools import partial
 from textwrap import wrap
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, NamedTuple, Optional
 
-from PIL import Image, ImageDraw, ImageFont
-from PIL.ImageFont import FreeTypeFont
-from whinesnips.utils.utils import half_round
+from slapimage.assets import CENTERING, assets
+from slapimage.assets import load as load_asset
+from slapimage.cache import Cache, cached
+from slapimage.effects import Shadow, parse_shadow, paste_shadow
+from slapimage.metrics import (
+    Font,
+    Text,
+    line_size,
+    primary_font,
+    runs,
+    text_size,
+    ttf,
+)
+from slapimage.modes import opaque, paste
+from slapimage.rich import Spans, spans
+from slapimage.utils import half_round
 
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
 
-def ttf(
-    font: str,
-    size: int = 10,
-) -> FreeTypeFont:
-    return ImageFont.truetype(path.join("assets/fonts", font) + ".ttf", size)
+    from PIL import Image, ImageDraw
+    from PIL.ImageFont import FreeTypeFont
+
+Rect = tuple[int, int, int, int]
+
+ELLIPSIS = "\u2026"
+FALLBACKS = ("truncate", "clip", "error")
 
 
 def font_size_fn(
@@ -145,111 +168,877 @@ def xyxy2xywh(
     return [x, y, x2 - x1, y2 - y1]
 
 
+def bbox_union(rects: list[Rect]) -> Rect:
+    """Smallest integer rectangle, padded by a pixel for anti-aliasing, that covers all of the given [x1, y1, x2, y2] rectangles."""
+
+    return (
+        math.floor(min(r[0] for r in rects)) - 1,
+        math.floor(min(r[1] for r in rects)) - 1,
+        math.ceil(max(r[2] for r in rects)) + 1,
+        math.ceil(max(r[3] for r in rects)) + 1,
+    )
+
+
+def bbox_overlap(a: Rect, b: Rect) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class Fit(NamedTuple):
+    size: int
+    lines: Optional[tuple[Text, ...]]  # `None` for single line text
+    tw: int
+    th: int
+    text: Optional[Text] = None  # the text as laid out, if the fallback truncated it
+    event: Optional[
+        str
+    ] = None  # the limit hit while fitting: "min_size", "iterations" or "time"
+
+
+class FitError(Exception):
+    """Raised when text does not fit its field within the fitting limits and the field's fallback is "error"."""
+
+
+class _Limit(Exception):
+    pass
+
+
+def _tfs(font: Font, line_metrics: str) -> Callable[..., tuple[int, int]]:
+    match line_metrics:
+        case "bbox":
+            return partial(text_size, font)
+        case "font":
+            return partial(line_size, font)
+        case _:
+            raise Exception(
+                f'Line metrics should be "bbox" or "font", not "{line_metrics}".',
+            )
+
+
+@cached("measure_text", max_entries=65536, shareable=True)
+def measure_text(
+    font: Font,
+    text: Text,
+    fw: int,
+    font_size: int,
+    multiline: bool,
+    line_height: float | int = 1,
+    line_metrics: str = "bbox",
+) -> Fit:
+    """
+    Lay the text out at the given font size, wrapping it to the field width `fw` if it is multiline, and measure it.
+
+    Returns:
+    `Fit`: font size, wrapped lines (`None` for single line text), text width and text height
+    """
+
+    tfs = _tfs(font, line_metrics)
+
+    if not multiline:
+        tw, th = tfs(font_size, text)
+        return Fit(font_size, None, tw, th)
+
+    tw_ls = []
+    th_ls = []
+
+    tt = text.splitlines()
+    ml = max(len(i) for i in tt)
+    cpfw = max(1, round(fw / (tfs(font_size, text)[0] / ml)))
+
+    tt = [
+        j for i in tt for j in (i.wrap(cpfw) if isinstance(i, Spans) else wrap(i, cpfw))
+    ]
+    ltt = len(tt)
+
+    for i in tt:
+        twi, thi = tfs(font_size, i)
+        tw_ls.append(twi)
+        th_ls.append(thi)
+
+    tw = max(tw_ls)
+    th = round(ltt * line_height * (sum(th_ls) / ltt))
+    return Fit(font_size, tuple(tt), tw, th)
+
+
+def _deterministic(fit: Fit) -> bool:
+    # how far a search gets in its time budget depends on the machine and its load
+    return fit.event != "time"
+
+
+@cached("fit_text", max_entries=8192, shareable=True, keep=_deterministic)
+def fit_text(
+    font: Font,
+    text: Text,
+    fw: int,
+    fh: int,
+    max_font_size: int,
+    multiline: bool,
+    line_height: float | int = 1,
+    line_metrics: str = "bbox",
+    min_font_size: int = 1,
+    max_iterations: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    fallback: str = "clip",
+) -> Fit:
+    """
+    Find the largest font size, between `min_font_size` and `max_font_size`, at which the text fits a field of `fw` by `fh`.
+
+    The text is measured once at `max_font_size`. If it overflows, text width scales almost linearly with the font size, and the area of wrapped text quadratically, so that measurement gives an estimate of the fitting size, which a few probes around it confirm. Fitting cost thus barely depends on how generous `max_font_size` is.
+
+    If the search runs out of probes or time, the largest size found to fit so far is used. If no size was found to fit, even `min_font_size`, the `fallback` applies at `min_font_size`: "truncate" cuts the text short with an ellipsis until it fits, "clip" lays it out as is, to be clipped to the field when drawn, and "error" raises `FitError`. Either way, the limit hit is recorded in `Fit.event`.
+
+    Fitting only depends on its arguments, so the result is cached and shared between every `Draw`, whatever its scale; unless the search ran out of time, as it may not next time.
+
+    Args:
+    - font (`Font`): font name, or fallback chain of font names
+    - text (`Text`): text to fit, plain or rich
+    - fw (`int`): field width
+    - fh (`int`): field height
+    - max_font_size (`int`): font size to start from
+    - multiline (`bool`): whether the text is wrapped into lines
+    - line_height (`float | int`): line height, relative to the average line height
+    - line_metrics (`str`): how line heights are measured, either "bbox" (height of each line's bounding box) or "font" (the font's ascent + descent)
+    - min_font_size (`int`): smallest font size to try
+    - max_iterations (`Optional[int]`): most font sizes to measure
+    - time_budget (`Optional[float]`): most seconds to spend searching
+    - fallback (`str`): what to do when nothing fits, either "truncate", "clip" or "error"
+
+    Returns:
+    `Fit`: font size, wrapped lines (`None` for single line text), text width, text height, and, if a limit was hit, the truncated text and the event
+    """
+
+    if fallback not in FALLBACKS:
+        raise Exception(
+            f'Fallback should be "truncate", "clip" or "error", not "{fallback}".',
+        )
+    min_font_size = max(1, min(min_font_size, max_font_size))
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    probes = 0
+    best = 0  # largest size found to fit
+
+    def measure(size: int) -> Fit:
+        return measure_text(
+            font,
+            text,
+            fw,
+            size,
+            multiline,
+            line_height,
+            line_metrics,
+        )
+
+    def fits(size: int) -> bool:
+        nonlocal probes, best
+        if max_iterations is not None and probes >= max_iterations:
+            raise _Limit("iterations")
+        if deadline is not None and time.perf_counter() > deadline:
+            raise _Limit("time")
+        probes += 1
+
+        fit = measure(size)
+        if (fit.tw <= fw) and (fit.th <= fh):
+            best = max(best, size)
+            return True
+        return False
+
+    try:
+        if fits(max_font_size):
+            return measure(max_font_size)
+
+        ref = measure(max_font_size)
+        if not multiline:
+            largest_fitting(
+                fits,
+                estimate_font_size(ref, fw, fh),
+                max_font_size - 1,
+                min_font_size,
+            )
+            if not best:
+                fits(min_font_size)
+        else:
+            # wrapping makes fitting jumpy, so walk down from just above the estimate rather than bisecting
+            tfs = _tfs(font, line_metrics)
+            width = sum(tfs(max_font_size, i)[0] for i in text.splitlines() if i)
+            size = min(
+                max_font_size - 1,
+                math.ceil(1.25 * estimate_wrapped_font_size(ref, width, fw, fh)) + 1,
+            )
+            while size >= min_font_size and not fits(size):
+                size -= 1
+        event = "min_size"
+    except _Limit as e:
+        event = str(e)
+
+    if best:
+        fit = measure(best)
+        return fit if event == "min_size" else fit._replace(event=event)
+    return overflow(
+        font,
+        text,
+        fw,
+        fh,
+        min_font_size,
+        multiline,
+        line_height,
+        line_metrics,
+        fallback,
+        event,
+    )
+
+
+def overflow(
+    font: Font,
+    text: Text,
+    fw: int,
+    fh: int,
+    font_size: int,
+    multiline: bool,
+    line_height: float | int,
+    line_metrics: str,
+    fallback: str,
+    event: str,
+) -> Fit:
+    """
+    Apply `fallback` to text that does not fit a field of `fw` by `fh` at `font_size`, see `fit_text`.
+
+    Returns:
+    `Fit`: the clipped or truncated text's fit, with `event` recorded
+    """
+
+    def measure(t: Text) -> Fit:
+        return measure_text(
+            font,
+            t,
+            fw,
+            font_size,
+            multiline,
+            line_height,
+            line_metrics,
+        )
+
+    match fallback:
+        case "error":
+            raise FitError(
+                f'"{text}" does not fit a {fw}x{fh} field at font size {font_size} ({event}).',
+            )
+        case "clip":
+            return measure(text)._replace(event=event)
+
+    def truncated(n: int) -> Text:
+        t = text[:n].rstrip()
+        if isinstance(t, Spans):
+            return t.append(ELLIPSIS, font)
+        return t + ELLIPSIS
+
+    lo, hi = 0, len(text) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        fit = measure(truncated(mid))
+        if (fit.tw <= fw) and (fit.th <= fh):
+            lo = mid
+        else:
+            hi = mid - 1
+    t = truncated(lo)
+    return measure(t)._replace(text=t, event=event)
+
+
+def estimate_font_size(ref: Fit, fw: int, fh: int) -> int:
+    """Estimate the font size at which single line text fits a field of `fw` by `fh` from its measurement `ref` at another size, as text width and height scale linearly with the font size."""
+
+    return max(1, math.floor(ref.size * min(fw / max(ref.tw, 1), fh / max(ref.th, 1))))
+
+
+def estimate_wrapped_font_size(ref: Fit, width: int, fw: int, fh: int) -> float:
+    """
+    Estimate the font size at which wrapped text fits a field of `fw` by `fh` from its measurement `ref` at another size, and the width of its paragraphs laid out on single lines at that size.
+
+    The area of the text, its width times its line height, scales with the square of the font size and has to fit in the field's area.
+    """
+
+    line_area = width * ref.th / len(ref.lines)  # type: ignore[arg-type]
+    return ref.size * math.sqrt(fw * fh / max(line_area, 1))
+
+
+def largest_fitting(
+    fits: Callable[[int], bool],
+    estimate: int,
+    hi: int,
+    lo: int = 1,
+) -> int:
+    """
+    Find the largest font size in [`lo`, `hi`] that `fits`, galloping out from `estimate` and then bisecting, so a good estimate takes a handful of probes.
+
+    Returns:
+    `int`: the largest fitting size, or `lo` if none fits
+    """
+
+    floor = lo
+    estimate = min(max(estimate, floor), hi)
+    step = 1
+    if fits(estimate):
+        lo = estimate
+        while lo < hi:
+            c = min(lo + step, hi)
+            if not fits(c):
+                hi = c - 1
+                break
+            lo, step = c, step * 2
+    else:
+        lo, hi = floor, estimate - 1
+        c = hi
+        while c > floor:
+            if fits(c):
+                lo = c
+                break
+            hi = c - 1
+            c, step = max(c - step, floor), step * 2
+
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if fits(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class Field(NamedTuple):
+    text: Text
+    font: Font
+    max_font_size: int
+    multiline: bool
+    line_height: float | int
+    line_metrics: str
+    min_font_size: int
+    max_iterations: Optional[int]
+    time_budget: Optional[float]
+    fallback: str
+    inverted: bool
+    shadow: Optional[Shadow]
+    xa: str  # horizontal anchor
+    ya: str  # vertical anchor
+    mlva: str  # multi line vertical anchor
+    xywh: tuple[int, int, int, int]  # field starting x and y-coordinate, width, height
+    xyxy: tuple[int, int, int, int]
+    kwargs: dict[str, Any]  # the rest of `ImageDraw.text`'s arguments
+
+    def measure(self, font_size: int) -> Fit:
+        """Lay the field's text out at the given font size."""
+
+        return measure_text(
+            self.font,
+            self.text,
+            self.xywh[2],
+            font_size,
+            self.multiline,
+            self.line_height,
+            self.line_metrics,
+        )
+
+    def fits(self, font_size: int) -> bool:
+        fit = self.measure(font_size)
+        return (fit.tw <= self.xywh[2]) and (fit.th <= self.xywh[3])
+
+    def overflow(self, font_size: int, event: str) -> Fit:
+        """Apply the field's `fallback` at the given font size, at which its text doesn't fit."""
+
+        return overflow(
+            self.font,
+            self.text,
+            self.xywh[2],
+            self.xywh[3],
+            font_size,
+            self.multiline,
+            self.line_height,
+            self.line_metrics,
+            self.fallback,
+            event,
+        )
+
+    def fit(self) -> Fit:
+        """Fit the field's text at the largest font size up to `max_font_size`."""
+
+        return fit_text(*self.fit_args())
+
+    def fit_args(self) -> tuple[Any, ...]:
+        """`fit_text`'s arguments for the field: fields with the same ones fit the same, wherever they are."""
+
+        return (
+            self.font,
+            self.text,
+            self.xywh[2],
+            self.xywh[3],
+            self.max_font_size,
+            self.multiline,
+            self.line_height,
+            self.line_metrics,
+            self.min_font_size,
+            self.max_iterations,
+            self.time_budget,
+            self.fallback,
+        )
+
+
+def field(
+    type_coords_tuple: tuple[str, int, int, int, int],
+    text: str | list[dict[str, Any]],
+    anchor: str,
+    font: str | list[str] | tuple[str, ...],
+    max_font_size: float | int = 100,
+    breaktext: Optional[bool] = None,
+    line_height: float | int = 1,
+    inverted: bool = False,
+    line_metrics: str = "bbox",
+    min_font_size: int = 1,
+    max_iterations: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    fallback: str = "clip",
+    shadow: Optional[dict[str, Any] | Shadow] = None,
+    **kwargs: Any,
+) -> Optional[Field]:
+    """
+    Parse a field spec, i.e. `Draw.text`'s arguments.
+
+    `font` is a font name, or a fallback chain of them: each character is drawn with the first font of the chain that has a glyph for it.
+
+    `text` is plain text, or rich text: a list of runs, each a dict with its `text` and optionally its own `font` and `fill`, e.g. `[{"text": "Juan Dela Cruz", "font": "Bold"}, {"text": ", CEO", "fill": "gray"}]`. The runs are wrapped and fitted together, as one paragraph.
+
+    `min_font_size`, `max_iterations`, `time_budget` and `fallback` bound fitting, see `fit_text`.
+
+    `shadow` is a drop shadow, a dict of `Shadow`'s fields, e.g. `{"offset": [3, 3], "blur": 4, "fill": "#00000080"}`. Outlines are `ImageDraw.text`'s own `stroke_width` and `stroke_fill`.
+
+    Returns:
+    `Optional[Field]`: the parsed field, or `None` if there is no text to draw
+    """
+
+    if breaktext is None:
+        breaktext = False
+
+    xa: str
+    ya: str
+    mlva_ls: list[str]
+
+    if not isinstance(font, str):
+        font = tuple(font) if len(font) > 1 else font[0]
+    if isinstance(text, list):
+        text = spans(text, font)
+    text = text.strip() if isinstance(text, Spans) else str(text).strip()
+    if not text:
+        return None
+    coords_type, *coords = type_coords_tuple
+    xa, ya, *mlva_ls = anchor  # type: ignore[misc] # multi line vertical anchor list
+    slas: str = xa + ya  # type: ignore[misc] # single line anchor set
+
+    if len(mlva_ls) > 1:
+        raise Exception(
+            "Anchor for multiline text should not exceed three characters.",
+        )
+
+    if coords_type == "xyxy":
+        # left-most x-coordinate, highest y-coordinate, right-most x-coordinate, lowest y-coordinate
+        x1, y1, x2, y2 = coords
+        # field starting x-coordinate, field starting y-coordinate, field width, field height
+        fx, fy, fw, fh = xyxy2xywh(slas, x1, y1, x2, y2)
+    elif coords_type == "xywh":
+        fx, fy, fw, fh = coords
+        x1, y1, x2, y2 = xywh2xyxy(slas, fx, fy, fw, fh)
+
+    multiline = ("\n" in text) or breaktext
+    mlva = ""
+    if multiline:
+        if len(mlva_ls) == 0:
+            mlva = "m"
+        else:
+            mlva = mlva_ls[0]
+    elif len(mlva_ls) > 0:
+        raise Exception(
+            "Anchor for single line text should not exceed two characters.",
+        )
+
+    return Field(
+        text,
+        font,
+        int(max_font_size),
+        multiline,
+        line_height,
+        line_metrics,
+        int(min_font_size),
+        max_iterations,
+        time_budget,
+        fallback,
+        inverted,
+        None if shadow is None else parse_shadow(shadow),
+        xa,
+        ya,
+        mlva,
+        (fx, fy, fw, fh),
+        (x1, y1, x2, y2),
+        kwargs,
+    )
+
+
+def fit_group(fields: list[Field]) -> list[Fit]:
+    """
+    Find the largest font size, up to the smallest `max_font_size`, at which every field fits, with one bisection over all of them, and fit each field at it.
+
+    Each probe stops at the first field that overflows, and the field that overflowed last is probed first.
+
+    The search is bounded by the strictest `max_iterations` and `time_budget` of the fields; if it runs out, the largest size found to fit so far is used. A field that doesn't fit the shared size, which is then at least the largest `min_font_size`, gets its own `fallback` at it, as in `fit_text`. The limit hit is recorded in the `Fit.event` of every field it affected.
+
+    Returns:
+    `list[Fit]`: each field's fit at the shared font size
+    """
+
+    order = list(fields)
+    iterations = [f.max_iterations for f in fields if f.max_iterations is not None]
+    budgets = [f.time_budget for f in fields if f.time_budget is not None]
+    max_iterations = min(iterations, default=None)
+    deadline = time.perf_counter() + min(budgets) if budgets else None
+    probes = 0
+
+    def fits(size: int) -> bool:
+        nonlocal probes
+        if max_iterations is not None and probes >= max_iterations:
+            raise _Limit("iterations")
+        if deadline is not None and time.perf_counter() > deadline:
+            raise _Limit("time")
+        probes += 1
+
+        for i, f in enumerate(order):
+            if not f.fits(size):
+                order.insert(0, order.pop(i))
+                return False
+        return True
+
+    lo = max(f.min_font_size for f in fields)
+    hi = max(lo, min(f.max_font_size for f in fields))
+    event = None
+    try:
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+    except _Limit as e:
+        event = str(e)
+
+    result = []
+    for f in fields:
+        fit = f.measure(lo)
+        if (fit.tw > f.xywh[2]) or (fit.th > f.xywh[3]):
+            fit = f.overflow(lo, event or "min_size")
+        elif event is not None:
+            fit = fit._replace(event=event)
+        result.append(fit)
+    return result
+
+
+class Layout(NamedTuple):
+    font: Font
+    font_size: int
+    lines: list[tuple[tuple[float, float], Text]]  # xy and text of each line
+    kwargs: dict[str, Any]  # anchor, fill and the rest of `ImageDraw.text`'s arguments
+    layer: Optional[Rect]  # where the rotated layer of inverted text is pasted
+    clip: Optional[Rect] = None  # the field, if the text overflows it
+    shadow: Optional[Shadow] = None
+
+
+# transparent layers of text, reused wherever the same text is drawn the same way
+tiles = Cache("tiles", max_bytes=32 << 20)
+
+# process pools of `Draw.texts` by number of workers, kept so their processes' fonts are too
+_pools: dict[Optional[int], tuple[int, ProcessPoolExecutor]] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers: Optional[int]) -> ProcessPoolExecutor:
+    # multiprocessing takes longer to import than the rest of this module
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pools_lock:
+        pid, pool = _pools.get(workers, (None, None))
+        # a forked process can't use its parent's pool
+        if pool is None or pid != os.getpid():
+            pool = ProcessPoolExecutor(workers)
+            _pools[workers] = (os.getpid(), pool)
+        return pool
+
+
+def _rasterize(layout: Layout, mask: bool) -> tuple[Image, tuple[int, int]]:
+    # in a `Draw.texts` worker process, with its own fonts
+    return rasterize(layout, ttf, mask=mask)
+
+
+def layout_runs(
+    layout: Layout,
+    fonts: Callable[..., FreeTypeFont],
+) -> list[tuple[tuple[float, float], Text, dict[str, Any]]]:
+    """
+    Split the lines of a layout into runs of one font and fill each.
+
+    With a fallback chain or rich text, runs are drawn one after another on the baseline the line would have in its primary font (see `primary_font`), so they are anchored at their left baseline ("ls") instead of the layout's anchor.
+
+    Returns:
+    `list[tuple[tuple[float, float], Text, dict[str, Any]]]`: xy, text and `ImageDraw.text` keyword arguments of each run
+    """
+
+    kwargs = dict(layout.kwargs)
+    size = layout.font_size
+    if isinstance(layout.font, str) and all(
+        isinstance(t, str) for _, t in layout.lines
+    ):
+        kwargs["font"] = fonts(layout.font, size)
+        return [(xy, t, kwargs) for xy, t in layout.lines]
+
+    xa, ya = kwargs.pop("anchor")
+    result = []
+    for (x, y), t in layout.lines:
+        styled = (
+            [(name, rt, fill) for st, f, fill in t.runs for name, rt in runs(f, st)]
+            if isinstance(t, Spans)
+            else [(name, rt, None) for name, rt in runs(layout.font, t)]
+        )
+        # measured with `fonts` too, whatever faces it hands out
+        lengths = [fonts(name, size).getlength(rt) for name, rt, _ in styled]
+        width = sum(lengths)
+        # rounded the way `ImageDraw.text` rounds its own anchor offsets
+        x -= {"l": 0, "m": math.floor(width / 2 + 0.5), "r": math.floor(width + 0.5)}[
+            xa
+        ]
+        # from the anchor's line down to the baseline
+        primary = fonts(primary_font(layout.font, t), size)
+        pt = str(t)
+        y += (
+            primary.getbbox(pt, anchor="l" + ya)[1]
+            - primary.getbbox(pt, anchor="ls")[1]
+        )
+
+        for (name, rt, fill), length in zip(styled, lengths, strict=True):
+            kw = {**kwargs, "font": fonts(name, size), "anchor": "ls"}
+            if fill is not None:
+                kw["fill"] = fill
+            result.append(((x, y), rt, kw))
+            x += length
+    return result
+
+
+def layout_bbox(layout: Layout, fonts: Callable[..., FreeTypeFont]) -> Rect:
+    """Region touched by the lines of a layout that is drawn straight onto the image."""
+
+    bbox_kwargs = {
+        k: v
+        for k, v in layout.kwargs.items()
+        if k in ("direction", "features", "language", "stroke_width")
+    }
+    rects = []
+    for (x, y), t, kw in layout_runs(layout, fonts):
+        x1, y1, x2, y2 = kw["font"].getbbox(t, anchor=kw["anchor"], **bbox_kwargs)
+        rects.append((x1 + x, y1 + y, x2 + x, y2 + y))
+    return bbox_union(rects)  # type: ignore[arg-type]
+
+
+def layer_rect(layout: Layout, fonts: Callable[..., FreeTypeFont]) -> Rect:
+    """Where the transparent layer of a layout goes: see `rasterize`."""
+
+    if layout.layer is not None:
+        return layout.layer
+    x1, y1, x2, y2 = layout_bbox(layout, fonts)
+    if layout.clip is not None:
+        cx1, cy1, cx2, cy2 = layout.clip
+        x1, y1 = max(x1, cx1), max(y1, cy1)
+        x2, y2 = max(min(x2, cx2), x1), max(min(y2, cy2), y1)
+    return (x1, y1, x2, y2)
+
+
+def layer_key(layout: Layout, rect: Rect) -> Hashable:
+    """What the transparent layer of a layout looks like, wherever it goes."""
+
+    px, py = rect[:2]
+    return (
+        layout.font,
+        layout.font_size,
+        tuple(((x - px, y - py), t) for (x, y), t in layout.lines)
+        if layout.layer is None
+        else tuple(layout.lines),
+        repr(sorted(layout.kwargs.items())),
+        (rect[2] - px, rect[3] - py),
+    )
+
+
+def solid(layout: Layout) -> bool:
+    """Whether every run of a layout, and its stroke, is drawn in an opaque fill, so it can be drawn straight onto the image: `ImageDraw` blends a translucent fill into the image's alpha channel, or drops its alpha on an image without one."""
+
+    fills = [layout.kwargs["fill"], layout.kwargs.get("stroke_fill")]
+    fills += [f for _, t in layout.lines if isinstance(t, Spans) for _, _, f in t.runs]
+    return all(f is None or opaque(f) for f in fills)
+
+
+def monochrome(layout: Layout) -> bool:
+    """Whether every run of a layout, and its stroke, is drawn in the layout's fill, which is opaque, so its layer can be an "L" mask of that fill."""
+
+    fill = layout.kwargs["fill"]
+    return (
+        fill is not None
+        and opaque(fill)
+        and layout.kwargs.get("stroke_fill") in (None, fill)
+        and all(
+            f in (None, fill)
+            for _, t in layout.lines
+            if isinstance(t, Spans)
+            for _, _, f in t.runs
+        )
+    )
+
+
+def rasterize(
+    layout: Layout,
+    fonts: Callable[..., FreeTypeFont],
+    rect: Optional[Rect] = None,
+    mask: bool = False,
+) -> tuple[Image, tuple[int, int]]:
+    """
+    Draw a layout into its own transparent layer: the rotated field for inverted text, otherwise the text's bounding box, clipped to the field if the text overflows it.
+
+    If `mask`, for a `monochrome` layout, the layer is an "L" mask of where its fill goes, a quarter of the size of an RGBA layer.
+
+    Returns:
+    `tuple[Image, tuple[int, int]]`: the layer, and where to paste it
+    """
+
+    from PIL import Image, ImageDraw
+
+    x1, y1, x2, y2 = layer_rect(layout, fonts) if rect is None else rect
+    if mask:
+        it = Image.new("L", (x2 - x1, y2 - y1), 0)
+        paint = {"fill": 255}
+        if "stroke_fill" in layout.kwargs:
+            paint["stroke_fill"] = 255
+    else:
+        it = Image.new("RGBA", (x2 - x1, y2 - y1), color=(0, 0, 0, 0))
+        paint = {}
+    itd = ImageDraw.Draw(it)
+    if layout.layer is not None:
+        for xy, t, kw in layout_runs(layout, fonts):
+            itd.text(text=t, xy=xy, **{**kw, **paint})
+        it = it.rotate(180)
+    else:
+        for (x, y), t, kw in layout_runs(layout, fonts):
+            itd.text(text=t, xy=(x - x1, y - y1), **{**kw, **paint})
+    return it, (x1, y1)
+
+
+def resize_template(template: Image, scale: float | int) -> Image:
+    """A copy of `template` resized by `scale`, to draw on at that scale, see `Draw.scaled`."""
+
+    from PIL import Image
+
+    w, h = template.size
+    return template.resize(
+        (round(w * scale), round(h * scale)),
+        Image.Resampling.LANCZOS,
+    )
+
+
 class Draw:
-    def __init__(self, img: Image) -> None:
+    """
+    Fit and draw fields onto an image.
+
+    `scale` is the size of `img` relative to the size that field coordinates, font sizes and line heights are given in.
+
+    `events` lists the fitting limits hit so far, see `fit_text`: for each, the field's `text`, the `event` and the font `size` used.
+    """
+
+    def __init__(self, img: Image, scale: float | int = 1) -> None:
+        from PIL import ImageDraw
+
         self.img = img
         self.draw = ImageDraw.Draw(img)
+        self.scale = scale
+        self.events: list[dict[str, Any]] = []
+        # fits by `Field.fit_args`, shared with other drawings, see `slapimage.render.draw_variants`
+        self.fits: Optional[dict[tuple[Any, ...], Fit]] = None
+        # if set, text is composited from cached layers rather than drawn in place
+        self.tiles: Optional[Cache] = None
+
+    @classmethod
+    def scaled(cls: type[Draw], template: Image, scale: float | int) -> Draw:
+        """
+        Draw on a copy of `template` resized by `scale`, taking full size field geometry.
+
+        Text is fitted at full size and then rendered natively at `scale`, so line breaks match across every output size.
+        """
 
-    def text(
+        return cls(resize_template(template, scale), scale)
+
+    def layout(
         self,
-        type_coords_tuple: tuple[str, int, int, int, int],
-        text: str,
-        anchor: str,
-        font: str,
-        max_font_size: float | int = 100,
-        breaktext: Optional[bool] = None,
-        line_height: float | int = 1,
-        inverted: bool = False,
+        *args: Any,
+        font_size: Optional[int] = None,
         **kwargs: Any,
-    ) -> None:
-        if breaktext is None:
-            breaktext = False
+    ) -> Optional[Layout]:
+        """
+        Fit text into the given field and work out where each of its lines goes, without drawing anything.
 
-        if not text:
-            return
+        Takes the same arguments as `field`. If `font_size` is given, the text is laid out at that size instead of being fitted.
 
-        xa: str
-        ya: str
-        mlva_ls: list[str]
+        Returns:
+        `Optional[Layout]`: the text's layout, or `None` if there is nothing to draw
+        """
 
-        text = str(text).strip()
-        coords_type, *coords = type_coords_tuple
-        xa, ya, *mlva_ls = anchor  # type: ignore[misc] # multi line vertical anchor list
-        slas: str = xa + ya  # type: ignore[misc] # single line anchor set
+        f = field(*args, **kwargs)
+        if f is None:
+            return None
+        if font_size is not None:
+            fit = f.measure(font_size)
+        elif self.fits is None:
+            fit = f.fit()
+        else:
+            args = f.fit_args()
+            fit = self.fits.get(args) or self.fits.setdefault(args, fit_text(*args))
+        self._record(f, fit)
+        return self.place(f, fit)
 
-        if len(mlva_ls) > 1:
-            raise Exception(
-                "Anchor for multiline text should not exceed three characters.",
+    def _record(self, f: Field, fit: Fit) -> None:
+        if fit.event is not None:
+            self.events.append(
+                {"text": str(f.text), "event": fit.event, "size": fit.size},
             )
 
-        if coords_type == "xyxy":
-            # left-most x-coordinate, highest y-coordinate, right-most x-coordinate, lowest y-coordinate
-            x1, y1, x2, y2 = coords
-            # field starting x-coordinate, field starting y-coordinate, field width, field height
-            fx, fy, fw, fh = xyxy2xywh(slas, x1, y1, x2, y2)
-        elif coords_type == "xywh":
-            fx, fy, fw, fh = coords
-            x1, y1, x2, y2 = xywh2xyxy(slas, fx, fy, fw, fh)
-
-        tfs = font_size_fn(
-            self.draw,
-            font,
-            (fx, fy),
-        )  # true font size # type: ignore[arg-type]
+    def place(self, f: Field, fit: Fit) -> Layout:
+        """Work out where each line of a fitted field goes."""
 
-        text_sls: str | list[str] = text  # text: string or list
+        xa, ya, mlva = f.xa, f.ya, f.mlva
+        slas = xa + ya
+        fx, fy, fw, fh = f.xywh
+        x1, y1, x2, y2 = f.xyxy
+        kwargs = dict(f.kwargs)
+        font_size, lines, th = fit.size, fit.lines, fit.th
+        text = f.text if fit.text is None else fit.text
 
-        max_font_size = int(max_font_size)
-        if ("\n" in text) or breaktext:
-            if len(mlva_ls) == 0:
-                mlva = "m"
-            else:
-                mlva = mlva_ls[0]
-            while True:
-                tw = 0
-                tw_ls = []
-                th_ls = []
-
-                tt = text.splitlines()
-                for i in tt:
-                    tw += tfs(max_font_size, i)[0]
-                ml = max(len(i) for i in tt)
-                cpfw = round(fw / (tfs(max_font_size, text)[0] / ml))
-
-                tt = [j for i in tt for j in wrap(i, cpfw)]
-                ltt = len(tt)
-
-                for i in tt:
-                    twi, thi = tfs(max_font_size, i)
-                    tw_ls.append(twi)
-                    th_ls.append(thi)
-
-                tw = max(tw_ls)
-                th = round(ltt * line_height * (sum(th_ls) / ltt))
-                if (tw > fw) or (th > fh):
-                    max_font_size -= 1
-                else:
-                    text_sls = tt
-                    break
-        else:
-            if len(mlva_ls) > 0:
-                raise Exception(
-                    "Anchor for single line text should not exceed two characters.",
-                )
-            tw, th = tfs(max_font_size, text)
-            if (tw > fw) or (th > fh):
-                while True:
-                    max_font_size -= 1
-                    tw, th = tfs(max_font_size, text)
-                    if (tw <= fw) and (th <= fh):
-                        break
-
-        if inverted:
+        s = self.scale
+        if s != 1:
+            font_size = max(1, round(font_size * s))
+            if "stroke_width" in kwargs:
+                kwargs["stroke_width"] = round(kwargs["stroke_width"] * s)
+
+        clip = None
+        if (fit.tw > fw) or (th > fh):
+            clip = (round(x1 * s), round(y1 * s), round(x2 * s), round(y2 * s))
+
+        sh = f.shadow
+        if sh is not None and s != 1:
+            sh = sh._replace(
+                offset=(round(sh.offset[0] * s), round(sh.offset[1] * s)),
+                blur=sh.blur * s,
+            )
+
+        layer = None
+        if f.inverted:
             hth = round(th / 2)  # halved text height
             lhth = th - hth  # large half of the text height
             fh += th
-            it = Image.new("RGBA", (fw, fh), color=(0, 0, 0, 0))
-            itd = ImageDraw.Draw(it)
+            px, py = round(x1 * s), round((y1 - lhth) * s)
+            layer = (px, py, px + round(fw * s), py + round(fh * s))
 
             match xa:
                 case "l":
@@ -265,39 +1054,209 @@ class Draw:
                 case "a":
                     fy = fh - th - lhth
                 case "m":
-                    fy: int = round(fh / 2)  # type: ignore[no-redef]
+                    fy = round(fh / 2)
                 case "d":
                     fy = th + lhth
-        else:
-            itd = self.draw
-
-        t_kwargs = {
-            "anchor": slas,
-            "fill": kwargs.pop("fill"),
-            "font": ttf(font=font, size=max_font_size),  # type: ignore[arg-type, misc]
-            **kwargs,
-        }
 
-        if isinstance(text_sls, list):
+        if lines is None:
+            ops = [((fx * s, fy * s), text)]
+        else:
+            ltt = len(lines)
             tholtt = th / ltt
 
             match mlva:
                 case "a":
-                    va: float = fh - th if inverted else y1  # vertical additive
+                    va: float = fh - th if f.inverted else y1  # vertical additive
                 case "m":
-                    va = (fh - th) / 2 if inverted else y1 + ((fh - th) / 2)
+                    va = (fh - th) / 2 if f.inverted else y1 + ((fh - th) / 2)
                 case "d":
-                    va = 0 if inverted else y1 + fh - th
-
-            for t, ty in zip(
-                text_sls,
-                range(round(tholtt / 2), th, round(tholtt)),
-                strict=True,
-            ):
-                itd.text(text=t, xy=(fx, va + ty), **t_kwargs)
+                    va = 0 if f.inverted else y1 + fh - th
+
+            ops = [
+                ((fx * s, (va + ty) * s), t)
+                for t, ty in zip(
+                    lines,
+                    range(round(tholtt / 2), th, round(tholtt)),
+                    strict=True,
+                )
+            ]
+
+        return Layout(
+            f.font,
+            font_size,
+            ops,
+            {"anchor": slas, "fill": kwargs.pop("fill"), **kwargs},
+            layer,
+            clip,
+            sh,
+        )
+
+    def text(self, *args: Any, **kwargs: Any) -> Optional[Rect]:
+        """
+        Fit and draw text into the given field.
+
+        Takes the same arguments as `Draw.layout`.
+
+        Returns:
+        `Optional[Rect]`: [x1, y1, x2, y2] of the region touched by the text, or `None` if nothing was drawn
+        """
+
+        layout = self.layout(*args, **kwargs)
+        if layout is None:
+            return None
+        return self._draw_layout(layout)
+
+    def _mask(self, layout: Layout) -> bool:
+        # with alpha or a palette, pasting a color through a mask isn't the same as pasting a layer
+        return self.img.mode in ("RGB", "L") and monochrome(layout)
+
+    def _draw_layout(self, layout: Layout) -> Rect:
+        if self.tiles is not None:
+            rect = layer_rect(layout, ttf)
+            mask = self._mask(layout)
+            key = (layer_key(layout, rect), mask)
+            it = self.tiles.get(key)
+            if it is None:
+                start = time.perf_counter()
+                it, _ = rasterize(layout, ttf, rect, mask)
+                self.tiles.put(key, it, time.perf_counter() - start)
+            return self._composite(layout, it, rect[:2])
+
+        if (
+            layout.layer is not None
+            or layout.clip is not None
+            or layout.shadow
+            or not solid(layout)
+        ):
+            it, xy = rasterize(layout, ttf, mask=self._mask(layout))
+            return self._composite(layout, it, xy)
+
+        for xy, t, kw in layout_runs(layout, ttf):
+            self.draw.text(text=t, xy=xy, **kw)
+        return layout_bbox(layout, ttf)
+
+    def _composite(self, layout: Layout, it: Image, xy: tuple[int, int]) -> Rect:
+        """Paste a rasterized layout, over its shadow if it has one."""
+
+        px, py = xy
+        rect = layout.layer or (px, py, px + it.width, py + it.height)
+        if layout.shadow is not None:
+            key = layer_key(layout, (px, py, px + it.width, py + it.height))
+            sx1, sy1, sx2, sy2 = paste_shadow(self.img, it, xy, key, layout.shadow)
+            rect = (
+                min(rect[0], sx1),
+                min(rect[1], sy1),
+                max(rect[2], sx2),
+                max(rect[3], sy2),
+            )
+        if it.mode == "L":
+            paste(self.img, layout.kwargs["fill"], xy, it)
         else:
-            itd.text(text=text_sls, xy=(fx, fy), **t_kwargs)
+            paste(self.img, it, xy)
+        return rect
+
+    def image(
+        self,
+        type_coords_tuple: tuple[str, int, int, int, int],
+        image: str,
+        anchor: str = "mm",
+        mode: str = "contain",
+        cache: Optional[Cache] = assets,
+    ) -> Rect:
+        """
+        Draw an image, e.g. a photo or a logo, into the given field.
+
+        Args:
+        - type_coords_tuple (`tuple[str, int, int, int, int]`): field coordinates, as for `field`
+        - image (`str`): path to the image
+        - anchor (`str`): where the image sits in the field, and where the field is relative to "xywh" coordinates, as in `xywh2xyxy`
+        - mode (`str`): how the image is resized to the field, either "contain", "cover" or "fill", see `slapimage.assets.resize`
+        - cache (`Optional[Cache]`): cache of resized images
+
+        Returns:
+        `Rect`: [x1, y1, x2, y2] of the region the image covers
+        """
+
+        coords_type, *coords = type_coords_tuple
+        if coords_type == "xywh":
+            coords = xywh2xyxy(anchor, *coords)
+        s = self.scale
+        x1, y1, x2, y2 = (round(c * s) for c in coords)
+
+        img = load_asset(image, (x2 - x1, y2 - y1), mode, anchor, cache)
+        xa, ya = anchor
+        x = x1 + round(CENTERING[xa] * (x2 - x1 - img.width))
+        y = y1 + round(CENTERING[ya] * (y2 - y1 - img.height))
+        paste(self.img, img, (x, y))
+        return (x, y, x + img.width, y + img.height)
+
+    def spec(self, **kwargs: Any) -> Optional[Rect]:
+        """Draw a field spec: with `Draw.image` if it has an `image`, with `Draw.text` otherwise."""
+
+        if "image" in kwargs:
+            return self.image(**kwargs)
+        return self.text(**kwargs)
+
+    def texts(
+        self,
+        fields: Iterable[dict[str, Any]],
+        workers: Optional[int] = None,
+    ) -> list[Optional[Rect]]:
+        """
+        Fit and draw several fields, rasterizing them concurrently.
+
+        Fields are fitted one after another, each rasterized into its own tight layer in a pool of processes, then composited in field order, so the output does not depend on which process finishes first. Processes rather than threads, as FreeType renders glyphs holding the GIL. The pool, and each of its processes' fonts, are kept for the next call.
+
+        Args:
+        - fields (`Iterable[dict[str, Any]]`): `Draw.text` keyword arguments of each field
+        - workers (`Optional[int]`): number of processes, as in `ProcessPoolExecutor`; with 1, fields are rasterized in this process
+
+        Returns:
+        `list[Optional[Rect]]`: what `Draw.text` would have returned for each field
+        """
+
+        layouts = [self.layout(**spec) for spec in fields]
+        drawn = [layout for layout in layouts if layout is not None]
+        masks = [self._mask(layout) for layout in drawn]
+        if (workers or os.cpu_count() or 1) == 1 or len(drawn) < 2:
+            rasterized = iter(list(map(_rasterize, drawn, masks)))
+        else:
+            rasterized = iter(list(_pool(workers).map(_rasterize, drawn, masks)))
+        layers = [layout and next(rasterized) for layout in layouts]
+
+        rects: list[Optional[Rect]] = []
+        for layout, layer in zip(layouts, layers, strict=True):
+            if layout is None or layer is None:
+                rects.append(None)
+                continue
+            rects.append(self._composite(layout, *layer))
+        return rects
+
+    def text_group(self, fields: Iterable[dict[str, Any]]) -> list[Optional[Rect]]:
+        """
+        Fit several fields, e.g. table cells or the lines of an address block, to the one largest font size at which all of them fit, then draw each of them once.
+
+        The fields' fitting limits and fallbacks apply as in `fit_group`, and the limits hit are recorded in `events`.
+
+        Args:
+        - fields (`Iterable[dict[str, Any]]`): `Draw.text` keyword arguments of each field
+
+        Returns:
+        `list[Optional[Rect]]`: what `Draw.text` returned for each field
+        """
+
+        parsed = [field(**spec) for spec in fields]
+        members = [f for f in parsed if f is not None]
+        if not members:
+            return [None] * len(parsed)
 
-        if inverted:
-            it = it.rotate(180)
-            self.img.paste(it, (x1, y1 - lhth, x2, y2 + hth), it)
+        fits = iter(fit_group(members))
+        rects: list[Optional[Rect]] = []
+        for f in parsed:
+            if f is None:
+                rects.append(None)
+                continue
+            fit = next(fits)
+            self._record(f, fit)
+            rects.append(self._draw_layout(self.place(f, fit)))
+        return rects
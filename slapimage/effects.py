@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from slapimage.cache import Cache
+from slapimage.modes import paste
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class Shadow(NamedTuple):
+    offset: tuple[int, int] = (2, 2)  # how far right and down the shadow falls
+    blur: float = 2  # Gaussian blur radius
+    fill: Any = (0, 0, 0, 128)  # color, its alpha being the shadow's opacity
+
+
+def parse_shadow(spec: dict[str, Any] | Shadow) -> Shadow:
+    """Parse a shadow spec, a dict of `Shadow`'s fields."""
+
+    if isinstance(spec, Shadow):
+        return spec
+    return Shadow(
+        tuple(spec.get("offset", (2, 2))),  # type: ignore[arg-type]
+        spec.get("blur", 2),
+        spec.get("fill", (0, 0, 0, 128)),
+    )
+
+
+masks = Cache("shadow_masks", max_bytes=16 << 20)
+
+
+def shadow_mask(
+    layer: Image,
+    key: Hashable,
+    sh: Shadow,
+    cache: Cache = masks,
+) -> tuple[Image, int]:
+    """
+    Blurred mask of a text layer's shadow, cached by `key`, which identifies the layer's content, and the shadow's blur and opacity, so repeated labels are only blurred once.
+
+    Returns:
+    `tuple[Image, int]`: the mask, and how far it reaches past the layer on each side
+    """
+
+    from PIL import Image, ImageColor, ImageFilter
+
+    pad = math.ceil(3 * sh.blur)
+    fill = ImageColor.getrgb(sh.fill) if isinstance(sh.fill, str) else sh.fill
+    alpha = fill[3] if len(fill) == 4 else 255
+
+    key = (key, sh.blur, alpha)
+    mask = cache.get(key)
+    if mask is None:
+        start = time.perf_counter()
+        mask = Image.new("L", (layer.width + 2 * pad, layer.height + 2 * pad), 0)
+        mask.paste(layer if layer.mode == "L" else layer.getchannel("A"), (pad, pad))
+        if sh.blur:
+            mask = mask.filter(ImageFilter.GaussianBlur(sh.blur))
+        if alpha != 255:
+            mask = mask.point(lambda v: v * alpha // 255)
+        cache.put(key, mask, time.perf_counter() - start)
+    return mask, pad
+
+
+def paste_shadow(
+    img: Image,
+    layer: Image,
+    xy: tuple[int, int],
+    key: Hashable,
+    sh: Shadow,
+) -> tuple[int, int, int, int]:
+    """
+    Composite the shadow of a text layer that is about to be pasted at `xy`.
+
+    Returns:
+    `tuple[int, int, int, int]`: [x1, y1, x2, y2] of the region the shadow covers
+    """
+
+    mask, pad = shadow_mask(layer, key, sh)
+    x, y = xy[0] + sh.offset[0] - pad, xy[1] + sh.offset[1] - pad
+    # the opacity is in the mask already
+    paste(img, sh.fill, (x, y), mask)
+    return (x, y, x + mask.width, y + mask.height)
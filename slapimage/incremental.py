@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, Any, Optional
+
+from slapimage.draw import Draw, Rect, bbox_overlap
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class Incremental:
+    """
+    Render records onto one output, redrawing only the fields that changed since the last render.
+
+    Each field is a dict of `Draw.spec` keyword arguments, keyed by a field name. For every field, the last spec drawn and the rectangle it covered are remembered, so a change only restores those rectangles from the pristine template and redraws the fields inside them.
+    """
+
+    def __init__(self, template: Image) -> None:
+        self.template = template
+        self.img = template.copy()
+        self.draw = Draw(self.img)
+        self.fields: dict[Hashable, tuple[dict[str, Any], Optional[Rect]]] = {}
+
+    def _restore(self, rect: Rect) -> None:
+        w, h = self.img.size
+        x1, y1, x2, y2 = (
+            max(rect[0], 0),
+            max(rect[1], 0),
+            min(rect[2], w),
+            min(rect[3], h),
+        )
+        if x1 < x2 and y1 < y2:
+            self.img.paste(self.template.crop((x1, y1, x2, y2)), (x1, y1))
+
+    def _closure(self, keys: set[Hashable], rects: list[Rect]) -> set[Hashable]:
+        """Grow `keys` with every drawn field whose rectangle overlaps a rectangle that is about to be restored, since restoring it would erase part of that field."""
+
+        keys = set(keys)
+        while True:
+            extra = {
+                k
+                for k, (_, rect) in self.fields.items()
+                if k not in keys
+                and rect is not None
+                and any(bbox_overlap(rect, r) for r in rects)
+            }
+            if not extra:
+                return keys
+            keys |= extra
+            rects = rects + [self.fields[k][1] for k in extra]  # type: ignore[misc]
+
+    def render(self, fields: dict[Hashable, dict[str, Any]]) -> Image:
+        """
+        Bring the output up to date with the given fields.
+
+        Args:
+        - fields (`dict[Hashable, dict[str, Any]]`): field name to `Draw.spec` keyword arguments, in drawing order
+
+        Returns:
+        `Image`: the updated output
+        """
+
+        todo = {
+            k
+            for k, spec in fields.items()
+            if k not in self.fields or self.fields[k][0] != spec
+        } | (self.fields.keys() - fields.keys())
+        new_rects: list[Rect] = []
+
+        while todo:
+            rects = [
+                self.fields[k][1]
+                for k in todo
+                if k in self.fields and self.fields[k][1] is not None
+            ] + new_rects
+            todo = self._closure(todo, rects)  # type: ignore[arg-type]
+            for k in todo:
+                if k in self.fields and (rect := self.fields[k][1]) is not None:
+                    self._restore(rect)
+                self.fields.pop(k, None)
+
+            new_rects = []
+            for k, spec in fields.items():
+                if k in todo:
+                    rect = self.draw.spec(**spec)
+                    self.fields[k] = (dict(spec), rect)
+                    if rect is not None:
+                        new_rects.append(rect)
+
+            # a redrawn field may now reach into a field that was left alone
+            overlapped = self._closure(set(), new_rects) - todo
+            if not overlapped:
+                break
+            todo |= overlapped
+
+        self.fields = {k: self.fields[k] for k in fields if k in self.fields}
+        return self.img
@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple, Optional, Protocol
+
+from slapimage.batch import load_job, load_records, render_record
+from slapimage.shared import Connections
+from slapimage.store import Store
+
+
+class Job(NamedTuple):
+    id: int
+    payload: dict[str, Any]  # e.g. a record to render
+    attempts: int  # times leased, this time included
+    lease: str  # token of the lease, which acks and fails must hold
+
+
+class JobQueue(Protocol):
+    """
+    Queue of jobs that a fleet of workers pulls from, the interface every queue backend implements.
+
+    A worker leases jobs, which hides them from other workers for the queue's visibility timeout, and then either acks or fails each of them. A job whose lease runs out, e.g. because its worker died, is leased again; a job that fails or runs out of leases too many times is dead-lettered.
+    """
+
+    def put(self, payloads: Iterable[dict[str, Any]]) -> int:
+        """Enqueue jobs, returning how many."""
+
+    def lease(self, n: int = 1) -> list[Job]:
+        """Lease up to `n` jobs, oldest first."""
+
+    def ack(self, job: Job, result: Optional[dict[str, Any]] = None) -> bool:
+        """Mark a job done, returning whether its lease was still held."""
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Give a job back to be retried, or dead-letter it, returning whether its lease was still held."""
+
+    def stats(self) -> dict[str, int]:
+        """Number of jobs in each state."""
+
+
+class SQLiteQueue:
+    """
+    `JobQueue` in a SQLite file in WAL mode, which the workers of one machine, or of several sharing a filesystem with working locks, pull from.
+
+    Jobs are "ready", "leased", "done" or "dead". Leasing takes the write lock only long enough to mark a batch of jobs as leased until `visibility_timeout` seconds from now.
+
+    Args:
+    - path (`str`): path to the SQLite file, created if missing
+    - visibility_timeout (`float`): seconds a lease hides a job from other workers
+    - max_attempts (`int`): times a job is leased before it is dead-lettered
+    - retry_delay (`float`): seconds a failed job waits before it can be leased again
+    """
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 60.0,
+        max_attempts: int = 3,
+        retry_delay: float = 0.0,
+    ) -> None:
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._db = Connections(path)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'ready',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                visible_at REAL NOT NULL DEFAULT 0,
+                lease TEXT,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_visible ON jobs (state, visible_at);
+            """,
+        )
+
+    def put(self, payloads: Iterable[dict[str, Any]]) -> int:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            n = db.executemany(
+                "INSERT INTO jobs (payload) VALUES (?)",
+                ((json.dumps(p, default=str),) for p in payloads),
+            ).rowcount
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return n
+
+    def lease(self, n: int = 1) -> list[Job]:
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # jobs whose last lease ran out
+            db.execute(
+                "UPDATE jobs SET state = 'dead', lease = NULL,"
+                " error = coalesce(error, 'lease expired')"
+                " WHERE state = 'leased' AND visible_at <= ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            # other leased jobs whose lease ran out are up for grabs again
+            rows = db.execute(
+                "SELECT id, payload, attempts FROM jobs"
+                " WHERE state IN ('ready', 'leased') AND visible_at <= ?"
+                " ORDER BY id LIMIT ?",
+                (now, n),
+            ).fetchall()
+            jobs = []
+            for id, payload, attempts in rows:
+                lease = uuid.uuid4().hex
+                db.execute(
+                    "UPDATE jobs SET state = 'leased', attempts = ?, visible_at = ?,"
+                    " lease = ? WHERE id = ?",
+                    (attempts + 1, now + self.visibility_timeout, lease, id),
+                )
+                jobs.append(Job(id, json.loads(payload), attempts + 1, lease))
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return jobs
+
+    def ack(self, job: Job, result: Optional[dict[str, Any]] = None) -> bool:
+        return (
+            self._db()
+            .execute(
+                "UPDATE jobs SET state = 'done', lease = NULL, result = ?"
+                " WHERE id = ? AND lease = ?",
+                (json.dumps(result, default=str), job.id, job.lease),
+            )
+            .rowcount
+            == 1
+        )
+
+    def fail(self, job: Job, error: str) -> bool:
+        state = "dead" if job.attempts >= self.max_attempts else "ready"
+        return (
+            self._db()
+            .execute(
+                "UPDATE jobs SET state = ?, visible_at = ?, lease = NULL, error = ?"
+                " WHERE id = ? AND lease = ?",
+                (state, time.time() + self.retry_delay, error, job.id, job.lease),
+            )
+            .rowcount
+            == 1
+        )
+
+    def dead(self) -> list[tuple[dict[str, Any], str]]:
+        """Payload and last error of each dead-lettered job."""
+
+        return [
+            (json.loads(payload), error)
+            for payload, error in self._db().execute(
+                "SELECT payload, error FROM jobs WHERE state = 'dead' ORDER BY id",
+            )
+        ]
+
+    def stats(self) -> dict[str, int]:
+        counts = dict.fromkeys(("ready", "leased", "done", "dead"), 0)
+        counts.update(
+            self._db().execute("SELECT state, count(*) FROM jobs GROUP BY state"),
+        )
+        return counts
+
+
+def work(
+    queue: JobQueue,
+    job: dict[str, Any],
+    out_dir: str,
+    store: Optional[Store] = None,
+    id_key: str = "id",
+    batch: int = 8,
+    idle: Optional[float] = None,
+    stop: Callable[[], bool] = lambda: False,
+) -> dict[str, int]:
+    """
+    Worker loop: lease records from the queue, render them (see `slapimage.batch.render_record`), and ack each with its result, or fail it with the error it raised.
+
+    Args:
+    - queue (`JobQueue`): queue of records
+    - job (`dict[str, Any]`): see `slapimage.batch.load_job`
+    - out_dir (`str`): directory to write outputs to
+    - store (`Optional[Store]`): content-addressed store to reuse unchanged outputs from
+    - id_key (`str`): record key of the record ID
+    - batch (`int`): records leased at once
+    - idle (`Optional[float]`): seconds to wait when the queue has nothing to lease; `None` to return instead
+    - stop (`Callable[[], bool]`): checked before each lease, to stop the loop
+
+    Returns:
+    `dict[str, int]`: how many records were `rendered`, `failed`, and `lost`, i.e. finished after their lease ran out and another worker took them over
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {"rendered": 0, "failed": 0, "lost": 0}
+    while not stop():
+        leased = queue.lease(batch)
+        if not leased:
+            if idle is None:
+                break
+            time.sleep(idle)
+            continue
+        for j in leased:
+            try:
+                result = render_record(job, j.payload, out_dir, store, id_key)
+            except Exception as e:  # noqa: BLE001
+                held = queue.fail(j, f"{type(e).__name__}: {e}")
+                counts["failed"] += 1
+            else:
+                held = queue.ack(j, {k: v for k, v in result.items() if k != "seconds"})
+                counts["rendered"] += 1
+            if not held:
+                counts["lost"] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="SQLite job queue of records to render.",
+    )
+    parser.add_argument("queue", help="queue file")
+    parser.add_argument(
+        "--visibility-timeout",
+        type=float,
+        default=60.0,
+        help="seconds a lease hides a record from other workers",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="times a record is leased before it is dead-lettered",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="enqueue records")
+    enqueue.add_argument(
+        "records",
+        help="records file, see slapimage.batch.load_records",
+    )
+
+    worker = commands.add_parser("work", help="render records until the queue is empty")
+    worker.add_argument("job", help="job file, see slapimage.batch.load_job")
+    worker.add_argument("out_dir", help="directory to write outputs to")
+    worker.add_argument("--store", help="content-addressed store directory")
+    worker.add_argument("--id-key", default="id", help="record key of the record ID")
+    worker.add_argument("--batch", type=int, default=8, help="records leased at once")
+    worker.add_argument(
+        "--idle",
+        type=float,
+        help="seconds to wait for more records when the queue is empty, rather than exit",
+    )
+
+    commands.add_parser("stats", help="number of jobs in each state")
+    commands.add_parser("dead", help="dead-lettered records and their errors")
+
+    args = parser.parse_args()
+
+    queue = SQLiteQueue(args.queue, args.visibility_timeout, args.max_attempts)
+    match args.command:
+        case "enqueue":
+            print(json.dumps({"enqueued": queue.put(load_records(args.records))}))
+        case "work":
+            print(
+                json.dumps(
+                    work(
+                        queue,
+                        load_job(args.job),
+                        args.out_dir,
+                        Store(args.store) if args.store else None,
+                        args.id_key,
+                        args.batch,
+                        args.idle,
+                    ),
+                ),
+            )
+        case "stats":
+            print(json.dumps(queue.stats()))
+        case "dead":
+            print(json.dumps(queue.dead(), default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import time
+from typing import Any
+
+import msgpack
+
+from slapimage.utils import file_hash
+
+
+class Journal:
+    """
+    Durable, append-only msgpack journal of finished records, so a batch that dies can resume where it stopped.
+
+    Entries are buffered and written in groups of `group`, or after `interval` seconds, each group flushed and fsynced. A torn group at the end of the file, from a crash mid-write, is cut off when the journal is reopened.
+
+    Args:
+    - path (`str`): journal file
+    - group (`int`): number of entries written at once
+    - interval (`float`): seconds after which buffered entries are written regardless
+    """
+
+    def __init__(self, path: str, group: int = 64, interval: float = 1.0) -> None:
+        self.path = path
+        self.group = group
+        self.interval = interval
+        self.buffer: list[dict[str, Any]] = []
+        self.flushed = time.monotonic()
+        self.done: dict[Any, dict[str, Any]] = {}
+
+        end = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                unpacker = msgpack.Unpacker(f)
+                try:
+                    for entry in unpacker:
+                        if not isinstance(entry, dict) or "id" not in entry:
+                            break
+                        self.done[entry["id"]] = entry
+                        end = unpacker.tell()
+                except (ValueError, msgpack.UnpackException):
+                    pass
+        self.f = open(path, "ab")
+        self.f.truncate(end)
+
+    def completed(self, id: Any, output: str) -> bool:
+        """Whether the record was journaled as done and its output is still there, intact."""
+
+        entry = self.done.get(id)
+        return (
+            entry is not None
+            and entry["output"] == output
+            and os.path.exists(output)
+            and file_hash(output) == entry["sha256"]
+        )
+
+    def record(self, entry: dict[str, Any]) -> None:
+        """Journal a finished record: a dict with its `id`, `output` path and the output's `sha256`."""
+
+        self.done[entry["id"]] = entry
+        self.buffer.append(entry)
+        if (
+            len(self.buffer) >= self.group
+            or time.monotonic() - self.flushed >= self.interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.f.write(b"".join(msgpack.packb(entry) for entry in self.buffer))
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.buffer = []
+        self.flushed = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self.f.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
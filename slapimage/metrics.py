@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from os import path
+from typing import TYPE_CHECKING
+
+from slapimage.cache import cached
+from slapimage.cmap import coverage
+from slapimage.rich import Spans
+
+if TYPE_CHECKING:
+    from PIL.ImageFont import FreeTypeFont
+
+SPACING = 4  # `ImageDraw`'s default spacing between the lines of multiline text
+
+Font = str | tuple[str, ...]  # a font name, or a fallback chain of them
+Text = str | Spans  # plain or rich text
+
+
+def font_path(font: str) -> str:
+    return path.join("assets/fonts", font) + ".ttf"
+
+
+def font_names(font: Font) -> tuple[str, ...]:
+    return (font,) if isinstance(font, str) else font
+
+
+def primary_font(font: Font, text: Text) -> str:
+    """The font whose baseline and line spacing the text is laid out on: the first of its fallback chain, or of its first run for rich text."""
+
+    if isinstance(text, Spans) and text.runs:
+        return text.fonts()[0]
+    return font_names(font)[0]
+
+
+@cached("runs", max_entries=65536)
+def runs(font: Font, text: Text) -> tuple[tuple[str, str], ...]:
+    """
+    Split text into runs of the first font of a fallback chain that has a glyph for each character, in one pass over the text.
+
+    Whitespace, and characters no font of the chain covers, stay in the run they are in rather than breaking it up. Rich text is split run by run, with each run's own font.
+
+    Returns:
+    `tuple[tuple[str, str], ...]`: font and text of each run
+    """
+
+    if isinstance(text, Spans):
+        return tuple(r for t, f, _ in text.runs for r in runs(f, t))
+    if isinstance(font, str):
+        return ((font, text),)
+
+    chain = [(name, coverage(font_path(name))) for name in font]
+    result = []
+    current, start = font[0], 0
+    for i, c in enumerate(text):
+        if c.isspace():
+            continue
+        cp = ord(c)
+        name = next((name for name, cov in chain if cp in cov), current)
+        if name != current:
+            if i > start:
+                result.append((current, text[start:i]))
+            current, start = name, i
+    result.append((current, text[start:]))
+    return tuple(result)
+
+
+def font_bytes(font: FreeTypeFont) -> int:
+    # a FreeType face holds about as much as its font file
+    return path.getsize(font.path)
+
+
+@cached("fonts", max_entries=256, sizeof=font_bytes)
+def ttf(
+    font: str,
+    size: int = 10,
+) -> FreeTypeFont:
+    from PIL import ImageFont
+
+    return ImageFont.truetype(font_path(font), size)
+
+
+@cached("font_metrics", max_entries=1024)
+def font_metrics(font: Font, size: int) -> tuple[int, int]:
+    """
+    Ascent and descent of the font at the given size; for a fallback chain, the largest of its fonts', as they share a baseline.
+
+    Returns:
+    `tuple[int, int]`: (ascent, descent)
+    """
+
+    metrics = [ttf(name, size).getmetrics() for name in font_names(font)]
+    return max(a for a, _ in metrics), max(d for _, d in metrics)
+
+
+def _line_bbox(font: Font, size: int, text: Text) -> tuple[int, int, int, int]:
+    if isinstance(font, str) and isinstance(text, str):
+        return ttf(font, size).getbbox(text)
+
+    # runs sit on the primary font's baseline, one after another
+    ascent = font_metrics(primary_font(font, text), size)[0]
+    x = 0.0
+    boxes = []
+    for name, t in runs(font, text):
+        f = ttf(name, size)
+        x1, y1, x2, y2 = f.getbbox(t, anchor="ls")
+        boxes.append((x + x1, ascent + y1, x + x2, ascent + y2))
+        x += text_length(name, size, t)
+    if not boxes:
+        return (0, 0, 0, 0)
+    return (
+        int(min(b[0] for b in boxes)),
+        int(min(b[1] for b in boxes)),
+        int(max(b[2] for b in boxes)),
+        int(max(b[3] for b in boxes)),
+    )
+
+
+@cached("text_bbox", max_entries=65536, shareable=True)
+def text_bbox(font: Font, size: int, text: Text) -> tuple[int, int, int, int]:
+    """
+    Bounding box of text drawn at (0, 0), the same as `ImageDraw.multiline_textbbox` gives with its defaults, but without an image.
+
+    Returns:
+    `tuple[int, int, int, int]`: [x1, y1, x2, y2]
+    """
+
+    if "\n" not in text:
+        return _line_bbox(font, size, text)
+
+    line_spacing = ttf(primary_font(font, text), size).getbbox("A")[3] + SPACING
+    boxes = [_line_bbox(font, size, line) for line in text.split("\n")]
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] + i * line_spacing for i, b in enumerate(boxes)),
+        max(b[2] for b in boxes),
+        max(b[3] + i * line_spacing for i, b in enumerate(boxes)),
+    )
+
+
+def text_size(font: Font, size: int, text: Text) -> tuple[int, int]:
+    """
+    Width and height of the text's bounding box.
+
+    Returns:
+    `tuple[int, int]`: (width, height)
+    """
+
+    x1, y1, x2, y2 = text_bbox(font, size, text)
+    return x2 - x1, y2 - y1
+
+
+@cached("text_length", max_entries=65536, shareable=True)
+def text_length(font: Font, size: int, text: Text) -> float:
+    """Advance width of single line text."""
+
+    if isinstance(font, str) and isinstance(text, str):
+        return ttf(font, size).getlength(text)
+    return sum(text_length(name, size, t) for name, t in runs(font, text))
+
+
+def line_size(font: Font, size: int, text: Text) -> tuple[int, int]:
+    """
+    Advance width of the widest line of the text, and the font's line height (ascent + descent), which doesn't depend on the text's glyphs.
+
+    Returns:
+    `tuple[int, int]`: (width, height)
+    """
+
+    return (
+        round(max(text_length(font, size, i) for i in text.split("\n"))),
+        sum(
+            font_metrics(
+                (text.fonts() or font) if isinstance(text, Spans) else font,
+                size,
+            ),
+        ),
+    )
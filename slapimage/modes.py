@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# output modes, see `output`
+MODES = ("auto", "L", "LA", "P")
+
+
+def ink(color: Any, mode: str) -> Any:
+    """A color as a pixel value of an image of `mode`, without its alpha."""
+
+    from PIL import Image, ImageColor
+
+    if isinstance(color, int | float):
+        return color
+    rgb = ImageColor.getrgb(color) if isinstance(color, str) else tuple(color)
+    return Image.new("RGB", (1, 1), rgb[:3]).convert(mode).getpixel((0, 0))
+
+
+def paste(
+    img: Image,
+    layer: Image | Any,
+    xy: tuple[int, int],
+    mask: Optional[Image] = None,
+) -> None:
+    """
+    Composite a layer over an image, in place.
+
+    Unlike `Image.paste`, which blends the alpha channel of an image with alpha towards the layer's, so a layer's antialiased edges would leave holes in an opaque image, the layer is composited over it, as `Image.alpha_composite` does.
+
+    Args:
+    - img (`Image`): the image
+    - layer (`Image | Any`): a layer, with or without alpha, or a color to paste through `mask`
+    - xy (`tuple[int, int]`): where the layer's top left corner goes, which may be off the image
+    - mask (`Optional[Image]`): "L" mask of the color
+    """
+
+    from PIL import Image
+
+    w, h = (layer if mask is None else mask).size
+    box = (xy[0], xy[1], xy[0] + w, xy[1] + h)
+    if img.mode not in ("RGBA", "LA"):
+        if mask is not None:
+            img.paste(ink(layer, img.mode), box, mask)
+        else:
+            img.paste(layer, box, layer if "A" in layer.getbands() else None)
+        return
+
+    if mask is not None:
+        layer = Image.new("RGBA", (w, h), ink(layer, "RGB"))
+        layer.putalpha(mask)
+    elif layer.mode != "RGBA":
+        layer = layer.convert("RGBA")
+    # cropping past the image's edges pads with transparency, and pasting clips
+    base = img.crop(box)
+    base = Image.alpha_composite(
+        base if base.mode == "RGBA" else base.convert("RGBA"),
+        layer,
+    )
+    img.paste(base if img.mode == "RGBA" else base.convert(img.mode), box)
+
+
+def opaque(color: Any) -> bool:
+    from PIL import ImageColor
+
+    if isinstance(color, int | float):
+        return True
+    rgb = ImageColor.getrgb(color) if isinstance(color, str) else tuple(color)
+    return len(rgb) < 4 or rgb[3] == 255
+
+
+def is_gray(color: Any) -> bool:
+    from PIL import ImageColor
+
+    if isinstance(color, int | float):
+        return True
+    r, g, b, *_ = ImageColor.getrgb(color) if isinstance(color, str) else color
+    return r == g == b
+
+
+def spec_colors(spec: dict[str, Any]) -> Iterator[Any]:
+    """Colors a text field spec draws in: its fill, its stroke's, its shadow's and its rich text runs'."""
+
+    for key in ("fill", "stroke_fill"):
+        if spec.get(key) is not None:
+            yield spec[key]
+    shadow = spec.get("shadow")
+    if shadow is not None:
+        yield shadow.fill if hasattr(shadow, "fill") else shadow.get("fill", (0, 0, 0))
+    if isinstance(spec.get("text"), list):
+        yield from (r["fill"] for r in spec["text"] if r.get("fill") is not None)
+
+
+def working_mode(
+    template: Image,
+    fields: list[dict[str, Any]],
+    mode: Optional[str] = None,
+) -> str:
+    """
+    Mode to draw on a template in, for the given output mode (see `output`).
+
+    Without an output mode, templates are drawn on in their own mode, as they always were: text on palette and bilevel templates is then aliased; but palette and bilevel templates with image fields are drawn on in RGB, or RGBA if they have transparency. With one, grayscale templates are drawn on as they are, at a quarter of the memory of RGBA, if every field draws in gray; otherwise, and for palette and bilevel templates, in which text can't be antialiased, in RGB, or RGBA if the template has transparency.
+
+    Args:
+    - template (`Image`): the template
+    - fields (`list[dict[str, Any]]`): compiled field specs, see `slapimage.render.compile_fields`
+    - mode (`Optional[str]`): output mode
+
+    Returns:
+    `str`: the mode
+    """
+
+    native = template.mode
+    color = (
+        "RGBA" if native in ("LA", "PA") or "transparency" in template.info else "RGB"
+    )
+    if mode is None:
+        images = any("image" in spec for spec in fields)
+        # pasted into a palette, an image's colors would be mapped to the wrong palette
+        return color if images and native in ("1", "P", "PA") else native
+    if native in ("L", "LA"):
+        gray = all(
+            "image" not in spec and all(is_gray(c) for c in spec_colors(spec))
+            for spec in fields
+        )
+        return native if gray else color
+    if native in ("1", "P", "PA"):
+        return color
+    return native
+
+
+def _exact(img: Image, n: int) -> Image:
+    # median cut keeps every color of an image with no more than `n`, where quantizing to a given palette merges close ones
+    from PIL import Image
+
+    if img.mode == "RGB":
+        return img.quantize(n, Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+
+    # no more colors than `n`, so no more RGB colors either: tell the colors apart by RGB index and alpha
+    rgb = _exact(img.convert("RGB"), n)
+    index = Image.frombytes("L", rgb.size, rgb.tobytes())
+    key = Image.merge("RGB", (index, img.getchannel("A"), Image.new("L", img.size)))
+    out = _exact(key, n)
+    palette = rgb.getpalette() or []
+    keys = out.getpalette() or []
+    out.putpalette(
+        [
+            v
+            for i, a in zip(keys[0 : 3 * n : 3], keys[1 : 3 * n : 3], strict=True)
+            for v in (*palette[3 * i : 3 * i + 3], a)
+        ],
+        "RGBA",
+    )
+    return out
+
+
+def _transparent(img: Image, template: Image, transparency: int | bytes) -> Image:
+    # an RGBA image in the colors of a palette template with transparency: opaque pixels in its nearest opaque color, transparent ones in its most transparent
+    from PIL import Image
+
+    palette = template.getpalette() or []
+    alpha = [255] * (len(palette) // 3)
+    if isinstance(transparency, int):
+        alpha[transparency] = 0
+    else:
+        alpha[: len(transparency)] = transparency
+    opaque = [i for i, a in enumerate(alpha) if a == 255]
+    clear = alpha.index(min(alpha))
+    if not opaque:
+        return img.quantize(256, dither=Image.Dither.NONE)
+
+    keep = Image.new("P", (1, 1))
+    keep.putpalette([v for i in opaque for v in palette[3 * i : 3 * i + 3]])
+    index = img.convert("RGB").quantize(palette=keep, dither=Image.Dither.NONE)
+    lut = opaque + [0] * (256 - len(opaque))
+    out = Image.frombytes("P", img.size, index.tobytes()).point(lut)
+    out.paste(clear, mask=img.getchannel("A").point([255] * 128 + [0] * 128))
+    out.putpalette(palette)
+    out.info["transparency"] = transparency
+    return out
+
+
+def _palette(
+    img: Image,
+    template: Optional[Image] = None,
+    colors: Optional[list[tuple[int, Any]]] = None,
+) -> Image:
+    from PIL import Image
+
+    colors = colors or img.getcolors(256)
+    if colors is not None:
+        # as few colors as the image has, so nothing is lost
+        return _exact(img, len(colors))
+
+    if template is not None and template.mode == "P":
+        if img.mode == "RGB":
+            return img.quantize(palette=template, dither=Image.Dither.NONE)
+        t = template.info.get("transparency")
+        if t is not None:
+            return _transparent(img, template, t)
+    return img.quantize(256, dither=Image.Dither.NONE)
+
+
+def output(
+    img: Image,
+    mode: Optional[str] = None,
+    template: Optional[Image] = None,
+) -> Image:
+    """
+    Convert a rendered image to its output mode, which takes less memory and encodes faster than RGB(A) when it can.
+
+    - `None`: as drawn, in the template's own mode, or RGB(A) for palette and bilevel templates with image fields, see `working_mode`
+    - "auto": the smallest mode that holds the image without loss: "L" if it is all gray, "P" if it has no more than 256 colors, as drawn otherwise
+    - "L" or "LA": grayscale
+    - "P": palette, of the image's own colors, alpha included, if it has no more than 256, otherwise of the template's palette if it has one, with transparent pixels on its most transparent color, or of 256 colors picked from the image
+
+    Args:
+    - img (`Image`): the rendered image, see `working_mode`
+    - mode (`Optional[str]`): output mode
+    - template (`Optional[Image]`): the template it was rendered on
+
+    Returns:
+    `Image`: the image in its output mode
+    """
+
+    from PIL import ImageChops
+
+    if mode is not None and mode not in MODES:
+        raise Exception(
+            f'Output mode should be "auto", "L", "LA" or "P", not "{mode}".',
+        )
+
+    if mode is None:
+        return img
+
+    if img.mode == "RGBA" and img.getextrema()[3] == (255, 255):
+        rgb = img.convert("RGB")
+    else:
+        rgb = img
+
+    match mode:
+        case "auto":
+            if rgb.mode != "RGB":
+                return img
+            r, g, b = rgb.split()
+            if (
+                ImageChops.difference(r, g).getbbox() is None
+                and ImageChops.difference(g, b).getbbox() is None
+            ):
+                return r
+            colors = rgb.getcolors(256)
+            return img if colors is None else _palette(rgb, colors=colors)
+        case "L" | "LA":
+            return img.convert(mode)
+        case "P":
+            # e.g. LA, through RGBA
+            if rgb.mode not in ("RGB", "RGBA"):
+                rgb = rgb.convert("RGBA" if "A" in rgb.getbands() else "RGB")
+            return _palette(rgb, template)
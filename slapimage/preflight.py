@@ -0,0 +1,144 @@
+import argparse
+import json
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Optional
+
+from slapimage.batch import load_job, load_records
+from slapimage.cache import share
+from slapimage.draw import FitError, field
+from slapimage.render import compile_fields
+
+
+def preflight_record(
+    job: dict[str, Any],
+    record: dict[str, Any],
+    min_font_size: int = 1,
+    id_key: str = "id",
+) -> list[dict[str, Any]]:
+    """
+    Fit every text field of a record the way `Draw.text` would, without rasterizing anything.
+
+    Returns:
+    `list[dict[str, Any]]`: for each field, the record's `id`, the field's index, the chosen font `size`, the number of `lines` it wraps to, whether it is `below_min` (smaller than `min_font_size`), whether it `overflows` its box even at the smallest size, and the fitting limit it hit as `event` (see `fit_text`)
+    """
+
+    results = []
+    for i, spec in enumerate(compile_fields(job["fields"], record)):
+        if "image" in spec:
+            continue
+        f = field(**spec)
+        if f is None:
+            continue
+        try:
+            fit = f.fit()
+        except FitError:
+            fit = f.measure(f.min_font_size)._replace(event="error")
+        results.append(
+            {
+                "id": record[id_key],
+                "field": i,
+                "size": fit.size,
+                "lines": 1 if fit.lines is None else len(fit.lines),
+                "below_min": fit.size < min_font_size,
+                "overflows": (fit.tw > f.xywh[2]) or (fit.th > f.xywh[3]),
+                "event": fit.event,
+            },
+        )
+    return results
+
+
+def run(
+    job: dict[str, Any],
+    records: Iterable[dict[str, Any]],
+    min_font_size: int = 1,
+    workers: Optional[int] = None,
+    id_key: str = "id",
+) -> dict[str, Any]:
+    """
+    Preflight every record of a job in a process pool.
+
+    Args:
+    - job (`dict[str, Any]`): see `slapimage.batch.load_job`
+    - records (`Iterable[dict[str, Any]]`): records to check
+    - min_font_size (`int`): smallest readable font size
+    - workers (`Optional[int]`): number of processes, as in `ProcessPoolExecutor`
+    - id_key (`str`): record key of the record ID
+
+    Returns:
+    `dict[str, Any]`: number of `records`; per field, histograms of the chosen `sizes` and `lines` and counts of records `below_min` and that `overflow`; and the `problems`, i.e. every field result (see `preflight_record`) that is below the minimum size, overflows or hit a fitting limit
+    """
+
+    fn = partial(
+        preflight_record,
+        job,
+        min_font_size=min_font_size,
+        id_key=id_key,
+    )
+    report: dict[str, Any] = {"records": 0, "fields": {}, "problems": []}
+    with ProcessPoolExecutor(workers) as executor:
+        for results in executor.map(fn, records, chunksize=64):
+            report["records"] += 1
+            for r in results:
+                agg = report["fields"].setdefault(
+                    r["field"],
+                    {
+                        "sizes": Counter(),
+                        "lines": Counter(),
+                        "below_min": 0,
+                        "overflows": 0,
+                    },
+                )
+                agg["sizes"][r["size"]] += 1
+                agg["lines"][r["lines"]] += 1
+                agg["below_min"] += r["below_min"]
+                agg["overflows"] += r["overflows"]
+                if r["below_min"] or r["overflows"] or r["event"]:
+                    report["problems"].append(r)
+
+    for agg in report["fields"].values():
+        agg["sizes"] = dict(sorted(agg["sizes"].items()))
+        agg["lines"] = dict(sorted(agg["lines"].items()))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check which records shrink below a readable size or overflow, without rendering.",
+    )
+    parser.add_argument("job", help="job file, see slapimage.batch.load_job")
+    parser.add_argument(
+        "records",
+        help="records file, see slapimage.batch.load_records",
+    )
+    parser.add_argument(
+        "--min-size",
+        type=int,
+        default=1,
+        help="smallest readable font size",
+    )
+    parser.add_argument("--workers", type=int, help="number of processes")
+    parser.add_argument("--id-key", default="id", help="record key of the record ID")
+    parser.add_argument(
+        "--shared-cache",
+        help="SQLite file to share measurements and fits between processes through",
+    )
+    args = parser.parse_args()
+
+    if args.shared_cache:
+        share(args.shared_cache)
+
+    report = run(
+        load_job(args.job),
+        load_records(args.records),
+        args.min_size,
+        args.workers,
+        args.id_key,
+    )
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import os
+import time
+import weakref
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Optional
+
+from slapimage import template
+from slapimage.cache import Cache, cached
+from slapimage.draw import Draw, resize_template, tiles
+from slapimage.modes import output, working_mode
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+@cached("templates", max_entries=32)
+def _load_template(path: str, mtime_ns: int, size: int) -> Image:
+    return template.load(path)
+
+
+def load_template(path: str) -> Image:
+    """Load a template once, from its memory-mapped prepared form (see `slapimage.template`), until the file changes; callers draw on copies of it."""
+
+    st = os.stat(path)
+    return _load_template(path, st.st_mtime_ns, st.st_size)
+
+
+def compile_fields(
+    fields: list[dict[str, Any]],
+    record: dict[str, Any],
+) -> list[dict[str, Any]]:
+    """
+    Fill a record's values into field specs.
+
+    Each field spec is a dict of `Draw.text` keyword arguments whose `text` is a `str.format` template, e.g. `"{name}"`, filled from the record (for rich text, each run's `text` is one), or of `Draw.image` keyword arguments whose `image` path is one, e.g. `"photos/{id}.jpg"`.
+
+    Args:
+    - fields (`list[dict[str, Any]]`): field specs
+    - record (`dict[str, Any]`): record values
+
+    Returns:
+    `list[dict[str, Any]]`: `Draw.text` keyword arguments of each field
+    """
+
+    return [
+        {**spec, "image": str(spec["image"]).format_map(record)}
+        if "image" in spec
+        else {**spec, "text": _format_text(spec.get("text", ""), record)}
+        for spec in fields
+    ]
+
+
+def _format_text(text: Any, record: dict[str, Any]) -> Any:
+    if isinstance(text, list):
+        # rich text runs
+        return [{**r, "text": str(r["text"]).format_map(record)} for r in text]
+    return str(text).format_map(record)
+
+
+def render(
+    template: Image,
+    fields: list[dict[str, Any]],
+    record: dict[str, Any],
+    scale: float | int = 1,
+    mode: Optional[str] = None,
+) -> Image:
+    """Render a record onto a copy of the template, in the given output mode, see `slapimage.modes.output`."""
+
+    return output(
+        draw_fields(template, compile_fields(fields, record), scale, mode).img,
+        mode,
+        template,
+    )
+
+
+# templates converted to their working mode and resized to their scale, drawn on copies of
+bases = Cache("bases", max_bytes=256 << 20)
+
+
+def _base(template: Image, scale: float | int, mode: str) -> Image:
+    """
+    The template converted to `mode` and resized by `scale`, converted and resized once for every record drawn on it.
+
+    Templates are taken to be left as they are once loaded, as `load_template`'s are.
+    """
+
+    if scale == 1 and mode == template.mode:
+        return template
+
+    key = (id(template), scale, mode)
+    entry = bases.get(key)
+    # ids of templates that are gone are reused
+    if entry is not None and entry[0]() is template:
+        return entry[1]
+
+    start = time.perf_counter()
+    base = template if mode == template.mode else template.convert(mode)
+    if scale != 1:
+        base = resize_template(base, scale)
+    bases.put(key, (weakref.ref(template), base), time.perf_counter() - start)
+    return base
+
+
+def _canvas(
+    template: Image,
+    fields: list[dict[str, Any]],
+    scale: float | int,
+    mode: Optional[str],
+) -> Draw:
+    """A drawing on a copy of the template, in the mode it is best drawn on in for the output mode, see `slapimage.modes.working_mode`."""
+
+    return Draw(
+        _base(template, scale, working_mode(template, fields, mode)).copy(),
+        scale,
+    )
+
+
+def draw_fields(
+    template: Image,
+    fields: list[dict[str, Any]],
+    scale: float | int = 1,
+    mode: Optional[str] = None,
+) -> Draw:
+    """
+    Draw compiled field specs onto a copy of the template, converted to the mode it is best drawn on in for the output mode `mode`, see `slapimage.modes.working_mode`.
+
+    Returns:
+    `Draw`: the drawing, with the output as `img`, still to be converted to its output mode (see `slapimage.modes.output`), and the fitting limits hit as `events`
+    """
+
+    draw = _canvas(template, fields, scale, mode)
+    for spec in fields:
+        draw.spec(**spec)
+    return draw
+
+
+def render_variants(
+    variants: list[tuple[Image, list[dict[str, Any]]]],
+    record: dict[str, Any],
+    scale: float | int = 1,
+    mode: Optional[str] = None,
+) -> list[Image]:
+    """Render a record onto a copy of each of several templates, e.g. square, story and banner sizes of one design, each with its own field specs, in the given output mode, see `slapimage.modes.output`."""
+
+    draws = draw_variants(
+        [(template, compile_fields(fields, record)) for template, fields in variants],
+        scale,
+        mode,
+    )
+    return [
+        output(draw.img, mode, template)
+        for draw, (template, _) in zip(draws, variants, strict=True)
+    ]
+
+
+def draw_variants(
+    variants: list[tuple[Image, list[dict[str, Any]]]],
+    scale: float | int = 1,
+    mode: Optional[str] = None,
+) -> list[Draw]:
+    """
+    Draw compiled field specs onto a copy of each of several templates, sharing text layout work between them.
+
+    Fields with the same fitting inputs, i.e. text, fonts, box size and fitting options, are fitted once for every variant, and text that is laid out the same, in the same fill, is rasterized once and composited wherever it goes.
+
+    Args:
+    - variants (`list[tuple[Image, list[dict[str, Any]]]]`): each template, with its compiled field specs
+    - scale (`float | int`): see `Draw.scaled`
+    - mode (`Optional[str]`): output mode the drawings are for, see `draw_fields`
+
+    Returns:
+    `list[Draw]`: the drawing of each variant, as `draw_fields` returns
+    """
+
+    fits: dict[tuple[Any, ...], Any] = {}
+    draws = []
+    for tpl, fields in variants:
+        draw = _canvas(tpl, fields, scale, mode)
+        draw.fits, draw.tiles = fits, tiles
+        for spec in fields:
+            draw.spec(**spec)
+        draws.append(draw)
+    return draws
+
+
+def encode(img: Image, format: str = "PNG", **params: Any) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format=format, **params)
+    return buf.getvalue()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from textwrap import wrap
+from typing import Any, Optional
+
+# a run: its text, font (a name or a fallback chain) and fill, `None` for the field's fill
+Run = tuple[str, Any, Any]
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+class Spans:
+    """
+    Rich text: runs of text, each with its own font and fill, that are measured, wrapped and fitted as one paragraph.
+
+    It behaves like the `str` of its text where fitting needs it to (length, slicing, splitting into lines, wrapping), carrying each character's style along.
+    """
+
+    __slots__ = ("runs",)
+
+    def __init__(self, runs: Iterator[Run] | tuple[Run, ...] | list[Run]) -> None:
+        self.runs: tuple[Run, ...] = tuple(
+            (t, _hashable(font), _hashable(fill)) for t, font, fill in runs if t
+        )
+
+    def __str__(self) -> str:
+        return "".join(t for t, _, _ in self.runs)
+
+    def __repr__(self) -> str:
+        return f"Spans({self.runs!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Spans) and self.runs == other.runs
+
+    def __hash__(self) -> int:
+        return hash(self.runs)
+
+    def __len__(self) -> int:
+        return sum(len(t) for t, _, _ in self.runs)
+
+    def __contains__(self, s: str) -> bool:
+        return s in str(self)
+
+    def __getitem__(self, key: slice) -> Spans:
+        start, stop, _ = key.indices(len(self))
+        result = []
+        at = 0
+        for t, font, fill in self.runs:
+            a, b = max(start - at, 0), min(stop - at, len(t))
+            if a < b:
+                result.append((t[a:b], font, fill))
+            at += len(t)
+        return Spans(result)
+
+    def __add__(self, s: str) -> Spans:
+        """Append plain text, in the style of the last run; see `append` for when there may be none."""
+
+        if not self.runs:
+            raise Exception("Rich text without runs has no style to append in.")
+        return self.append(s, None)
+
+    def append(self, s: str, font: Any, fill: Any = None) -> Spans:
+        """Append plain text, in the style of the last run, or in the given one if there are no runs, e.g. the field's font and fill."""
+
+        if not self.runs:
+            return Spans(((s, font, fill),))
+        t, font, fill = self.runs[-1]
+        return Spans((*self.runs[:-1], (t + s, font, fill)))
+
+    def _strip(self, chars: Optional[str], left: bool, right: bool) -> Spans:
+        text = str(self)
+        start = len(text) - len(text.lstrip(chars)) if left else 0
+        stop = len(text.rstrip(chars)) if right else len(text)
+        return self[start:stop]
+
+    def strip(self, chars: Optional[str] = None) -> Spans:
+        return self._strip(chars, True, True)
+
+    def rstrip(self, chars: Optional[str] = None) -> Spans:
+        return self._strip(chars, False, True)
+
+    def split(self, sep: str) -> list[Spans]:
+        result = []
+        at = 0
+        for part in str(self).split(sep):
+            result.append(self[at : at + len(part)])
+            at += len(part) + len(sep)
+        return result
+
+    def splitlines(self) -> list[Spans]:
+        return self.split("\n")
+
+    def wrap(self, width: int) -> list[Spans]:
+        """Wrap like `textwrap.wrap`, but keeping tabs and whitespace as they are, so every line is a slice of the text."""
+
+        text = str(self)
+        result = []
+        at = 0
+        for line in wrap(text, width, expand_tabs=False, replace_whitespace=False):
+            start = text.index(line, at)
+            result.append(self[start : start + len(line)])
+            at = start + len(line)
+        return result
+
+    def fonts(self) -> tuple[str, ...]:
+        """Every font name the runs use, in order of first use."""
+
+        names: dict[str, None] = {}
+        for _, font, _ in self.runs:
+            names.update(dict.fromkeys((font,) if isinstance(font, str) else font))
+        return tuple(names)
+
+
+def spans(runs: list[dict[str, Any]], font: Any, fill: Any = None) -> Spans:
+    """
+    Parse rich text, a list of runs, each a dict with its `text` and optionally its `font` and `fill`, which default to the field's.
+
+    Returns:
+    `Spans`: the runs, with fonts and fills filled in
+    """
+
+    return Spans(
+        (str(r["text"]), r.get("font", font), r.get("fill", fill)) for r in runs
+    )
@@ -0,0 +1,129 @@
+import json
+import os
+from typing import Any, Optional
+
+from slapimage.render import compile_fields
+
+# rough seconds per unit of each feature, until a model is learned from earlier runs
+DEFAULT_COEFFICIENTS = [1e-2, 5e-4, 1.5e-3, 1e-3]
+# version of `features`: models learned from other versions are discarded
+FEATURES = 2
+
+
+def features(job: dict[str, Any], record: dict[str, Any]) -> list[float]:
+    """
+    Cost features of a record: a constant, text length summed over single line fields and over multiline fields, and the number of fields.
+
+    Fitting measures the text once at `max_font_size` and then probes a handful of sizes around an estimate of the fitting size (see `slapimage.draw.fit_text`), so its cost grows with the length of the text but hardly with `max_font_size`; wrapped fields measure every line at every probe, so they get their own coefficient.
+    """
+
+    single = multi = 0.0
+    fields = compile_fields(job["fields"], record)
+    for f in fields:
+        text = f.get("text", "")
+        if isinstance(text, list):
+            # rich text runs
+            text = "".join(str(r["text"]) for r in text)
+        n = float(len(str(text)))
+        if f.get("breaktext") or "\n" in str(text):
+            multi += n
+        else:
+            single += n
+    return [1.0, single, multi, float(len(fields))]
+
+
+def _solve(a: list[list[float]], b: list[float]) -> list[float]:
+    """Solve `a x = b` by Gaussian elimination with partial pivoting; singular columns get 0."""
+
+    n = len(b)
+    m = [row[:] + [v] for row, v in zip(a, b, strict=True)]
+    for i in range(n):
+        p = max(range(i, n), key=lambda r: abs(m[r][i]))
+        m[i], m[p] = m[p], m[i]
+        if abs(m[i][i]) < 1e-12:
+            continue
+        for r in range(n):
+            if r != i:
+                k = m[r][i] / m[i][i]
+                m[r] = [x - k * y for x, y in zip(m[r], m[i], strict=True)]
+    return [m[i][n] / m[i][i] if abs(m[i][i]) >= 1e-12 else 0.0 for i in range(n)]
+
+
+class CostModel:
+    """
+    Linear model of a record's render time from its `features`, learned from the timings of earlier runs.
+
+    Args:
+    - path (`Optional[str]`): JSON file the model is loaded from and saved to
+    - max_samples (`int`): number of most recent timings kept to learn from
+    """
+
+    def __init__(self, path: Optional[str] = None, max_samples: int = 10000) -> None:
+        self.path = path
+        self.max_samples = max_samples
+        self.coefficients = list(DEFAULT_COEFFICIENTS)
+        self.samples: list[tuple[list[float], float]] = []
+
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("features") == FEATURES:
+                self.coefficients = data["coefficients"]
+                self.samples = [(x, y) for x, y in data["samples"]]
+
+    def estimate(self, x: list[float]) -> float:
+        return sum(c * v for c, v in zip(self.coefficients, x, strict=True))
+
+    def observe(self, x: list[float], seconds: float) -> None:
+        self.samples.append((x, seconds))
+
+    def learn(self) -> None:
+        """Refit the coefficients by least squares over the kept timings, keeping them non-negative."""
+
+        self.samples = self.samples[-self.max_samples :]
+        if len(self.samples) < len(self.coefficients):
+            return
+
+        n = len(self.coefficients)
+        # a little ridge regularization keeps collinear features, e.g. the constant and the field count, solvable
+        ata = [
+            [
+                sum(x[i] * x[j] for x, _ in self.samples) + (1e-9 if i == j else 0)
+                for j in range(n)
+            ]
+            for i in range(n)
+        ]
+        atb = [sum(x[i] * y for x, y in self.samples) for i in range(n)]
+        self.coefficients = [max(c, 0.0) for c in _solve(ata, atb)]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "features": FEATURES,
+                    "coefficients": self.coefficients,
+                    "samples": self.samples,
+                },
+                f,
+            )
+        os.replace(tmp, self.path)
+
+
+def schedule(
+    job: dict[str, Any],
+    records: list[dict[str, Any]],
+    model: CostModel,
+) -> list[tuple[dict[str, Any], list[float]]]:
+    """
+    Order records longest first by their estimated cost, so that when workers pull the next record as they free up, the expensive ones don't end up alone at the tail.
+
+    Returns:
+    `list[tuple[dict[str, Any], list[float]]]`: each record with its features, most expensive first
+    """
+
+    scheduled = [(record, features(job, record)) for record in records]
+    scheduled.sort(key=lambda rx: model.estimate(rx[1]), reverse=True)
+    return scheduled
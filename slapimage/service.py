@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import signal
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Optional
+
+from slapimage.cache import share
+from slapimage.render import encode, load_template, render
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def render_request(request: dict[str, Any]) -> bytes:
+    """
+    Render one request, in an executor worker. Templates, fonts and measurements stay cached in the worker between requests.
+
+    A request is a dict with:
+    - template (`str`): path to the template
+    - fields (`list[dict[str, Any]]`): field specs, as in `slapimage.render.compile_fields`
+    - record (`dict[str, Any]`): record values
+    - scale (`float | int`, optional): output scale, as in `Draw.scaled`
+    - format (`str`, optional): output format, PNG by default
+    - mode (`str`, optional): output mode, see `slapimage.modes.output`
+    """
+
+    img = render(
+        load_template(request["template"]),
+        request["fields"],
+        request["record"],
+        request.get("scale", 1),
+        request.get("mode"),
+    )
+    return encode(img, request.get("format", "PNG"))
+
+
+class Service:
+    """
+    Asyncio render service that coalesces identical in-flight requests and runs `Draw` work on a bounded executor.
+
+    Endpoints:
+    - `POST /render`: render the JSON request body (see `render_request`), returning the encoded image
+    - `GET /stats`: request counters, as JSON
+    - `GET /health`: liveness check
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        self.executor = executor or ProcessPoolExecutor(workers)
+        self.inflight: dict[str, asyncio.Future[bytes]] = {}
+        self.stats = {"requests": 0, "rendered": 0, "coalesced": 0, "errors": 0}
+
+    async def render(self, request: dict[str, Any]) -> bytes:
+        """Render a request, sharing the result with every identical request already in flight."""
+
+        self.stats["requests"] += 1
+        key = hashlib.sha256(
+            json.dumps(request, sort_keys=True, separators=(",", ":")).encode(),
+        ).hexdigest()
+
+        fut = self.inflight.get(key)
+        if fut is None:
+            self.stats["rendered"] += 1
+            fut = asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                render_request,
+                request,
+            )
+            self.inflight[key] = fut
+            fut.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        # a cancelled waiter must not cancel the render other waiters share
+        return await asyncio.shield(fut)
+
+    async def respond(
+        self,
+        method: str,
+        target: str,
+        body: bytes,
+    ) -> tuple[int, str, bytes]:
+        match method, target:
+            case "POST", "/render":
+                try:
+                    request = json.loads(body)
+                    data = await self.render(request)
+                except (ValueError, KeyError, TypeError) as e:
+                    self.stats["errors"] += 1
+                    return 400, "text/plain", str(e).encode()
+                except Exception as e:  # noqa: BLE001
+                    self.stats["errors"] += 1
+                    return 500, "text/plain", str(e).encode()
+                return 200, f"image/{request.get('format', 'PNG').lower()}", data
+            case "GET", "/stats":
+                return (
+                    200,
+                    "application/json",
+                    json.dumps({**self.stats, "inflight": len(self.inflight)}).encode(),
+                )
+            case "GET", "/health":
+                return 200, "text/plain", b"ok"
+            case _, "/render" | "/stats" | "/health":
+                return 405, "text/plain", b""
+            case _:
+                return 404, "text/plain", b""
+
+    async def handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Serve HTTP/1.1 requests on one connection, keeping it alive until the client closes it."""
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, v = line.decode("latin-1").split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, content_type, data = await self.respond(method, target, body)
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                        f"Content-Type: {content_type}\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + data,
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self,
+        socket: Optional[str] = None,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+    ) -> None:
+        """Serve on the Unix socket `socket` if given, otherwise on `host`:`port`, until SIGINT or SIGTERM."""
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        if socket is not None:
+            server = await asyncio.start_unix_server(self.handle, path=socket)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await stop.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local slapimage render service.")
+    parser.add_argument("--socket", help="Unix socket path to serve on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="number of render processes")
+    parser.add_argument(
+        "--shared-cache",
+        help="SQLite file to share measurements and fits between processes through",
+    )
+    args = parser.parse_args()
+
+    if args.shared_cache:
+        share(args.shared_cache)
+
+    service = Service(workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port))
+    finally:
+        service.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
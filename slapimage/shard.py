@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from typing import Any, Optional
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """
+    Parse a shard spec, "i/n", shard `i` (counting from 0) of `n`.
+
+    Returns:
+    `tuple[int, int]`: (i, n)
+    """
+
+    try:
+        i, n = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise Exception(f'Shard should be "i/n", e.g. "0/4", not "{spec}".') from None
+    if not 0 <= i < n:
+        raise Exception(f"Shard {i} of {n} is out of range.")
+    return i, n
+
+
+def shard_of(id: Any, n: int) -> int:
+    """Which of `n` shards a record ID belongs to, the same on every machine and Python process, unlike `hash`."""
+
+    digest = hashlib.sha256(str(id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % n
+
+
+def select(
+    records: Iterable[dict[str, Any]],
+    shard: tuple[int, int],
+    id_key: str = "id",
+) -> Iterator[dict[str, Any]]:
+    """Records of shard `i` of `n`."""
+
+    i, n = shard
+    return (record for record in records if shard_of(record[id_key], n) == i)
+
+
+def write_manifest(
+    path: str,
+    shard: Optional[tuple[int, int]],
+    outputs: list[dict[str, Any]],
+    report: dict[str, Any],
+) -> None:
+    """
+    Write a shard's manifest: its `shard` and `shards` count, the `outputs` it wrote (each with its record's `id`, the `output` path and the output's `sha256`), and the batch report.
+
+    The manifest is written under a temporary name and then renamed, so a shard that dies never leaves one behind.
+    """
+
+    i, n = shard or (0, 1)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {"shard": i, "shards": n, "outputs": outputs, "report": report},
+            f,
+            default=str,
+        )
+    os.replace(tmp, path)
+
+
+def merge(
+    manifests: list[dict[str, Any]],
+    records: Optional[Iterable[dict[str, Any]]] = None,
+    id_key: str = "id",
+) -> dict[str, Any]:
+    """
+    Merge the manifests of a sharded batch, checking that it is complete and that no record was rendered twice.
+
+    Args:
+    - manifests (`list[dict[str, Any]]`): manifest of each shard, see `write_manifest`
+    - records (`Optional[Iterable[dict[str, Any]]]`): the batch's records, to check that each of them was rendered, and by its own shard
+    - id_key (`str`): record key of the record ID
+
+    Returns:
+    `dict[str, Any]`: the merged `outputs`, and the problems found: shard counts that disagree (`shards`), shards with no manifest (`missing_shards`) or more than one (`duplicate_shards`), IDs with more than one output (`duplicates`), IDs rendered by the wrong shard (`misplaced`), records with no output (`missing`), and outputs of no record (`unexpected`); `complete` is whether there are none
+    """
+
+    counts = sorted({m["shards"] for m in manifests})
+    n = counts[0] if len(counts) == 1 else None
+    seen = Counter(m["shard"] for m in manifests)
+
+    outputs: dict[Any, dict[str, Any]] = {}
+    duplicates = set()
+    misplaced = []
+    for m in manifests:
+        for entry in m["outputs"]:
+            id = entry["id"]
+            if id in outputs:
+                duplicates.add(id)
+            outputs[id] = entry
+            if n is not None and shard_of(id, n) != m["shard"]:
+                misplaced.append(id)
+
+    problems: dict[str, list[Any]] = {
+        "shards": counts if n is None else [],
+        "missing_shards": [] if n is None else [i for i in range(n) if i not in seen],
+        "duplicate_shards": sorted(i for i, c in seen.items() if c > 1),
+        "duplicates": sorted(duplicates, key=str),
+        "misplaced": misplaced,
+        "missing": [],
+        "unexpected": [],
+    }
+    if records is not None:
+        ids = Counter(record[id_key] for record in records)
+        problems["duplicates"] = sorted(
+            duplicates | {id for id, c in ids.items() if c > 1},
+            key=str,
+        )
+        problems["missing"] = [id for id in ids if id not in outputs]
+        problems["unexpected"] = [id for id in outputs if id not in ids]
+
+    return {
+        "complete": not any(problems.values()),
+        **problems,
+        "outputs": list(outputs.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Merge the manifests of a sharded batch, checking that it is complete and has no duplicates.",
+    )
+    parser.add_argument("manifests", nargs="+", help="manifest of each shard")
+    parser.add_argument(
+        "--records",
+        help="records file, see slapimage.batch.load_records, to check against",
+    )
+    parser.add_argument("--id-key", default="id", help="record key of the record ID")
+    parser.add_argument("--out", help="file to write the merged manifest to")
+    args = parser.parse_args()
+
+    manifests = []
+    for path in args.manifests:
+        with open(path, encoding="utf-8") as f:
+            manifests.append(json.load(f))
+
+    records = None
+    if args.records:
+        from slapimage.batch import load_records
+
+        records = load_records(args.records)
+
+    merged = merge(manifests, records, args.id_key)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(merged, f, default=str)
+    print(json.dumps({k: v for k, v in merged.items() if k != "outputs"}, default=str))
+    raise SystemExit(0 if merged["complete"] else 1)
+
+
+if __name__ == "__main__":
+    main()
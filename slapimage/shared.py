@@ -0,0 +1,96 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+from collections.abc import Hashable
+from typing import Any
+
+# how many writes a process makes between trims of the oldest entries
+TRIM_EVERY = 1024
+
+
+class Connections:
+    """
+    Connections to a SQLite file in autocommit mode, one per thread and process, as connections can't be shared by threads, nor survive a fork. Calling it returns the calling thread's.
+
+    Args:
+    - path (`str`): path to the SQLite file
+    - pragmas (`str`): statements run on each new connection, e.g. "PRAGMA synchronous=OFF"
+    """
+
+    def __init__(self, path: str, *pragmas: str) -> None:
+        self.path = path
+        self.pragmas = pragmas
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            for pragma in self.pragmas:
+                db.execute(pragma)
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+
+class SharedCache:
+    """
+    Cache shared by every process on a machine through a SQLite file in WAL mode, so the workers of a pool warm each other up rather than each measuring and fitting the same text.
+
+    In WAL mode, reads never wait on a lock, even while another process writes. Entries are never updated, and once the file holds more than `max_entries`, the oldest are trimmed.
+
+    Results are keyed by font name, not font content, so the file should be cleared, or a new one used, when fonts change.
+
+    Args:
+    - path (`str`): path to the SQLite file, created if missing
+    - max_entries (`int`): most entries kept, roughly
+    """
+
+    def __init__(self, path: str, max_entries: int = 1 << 20) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.writes = 0
+        # a lost write is only a lost cache entry
+        self._db = Connections(path, "PRAGMA synchronous=OFF")
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, value BLOB NOT NULL)",
+        )
+
+    @staticmethod
+    def _key(name: str, key: Hashable) -> bytes:
+        return hashlib.sha256(f"{name}\0{key!r}".encode()).digest()
+
+    def get(self, name: str, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up the result of cache `name` for `key`.
+
+        Returns:
+        `Any`: the result, or `default`
+        """
+
+        row = (
+            self._db()
+            .execute("SELECT value FROM results WHERE key = ?", (self._key(name, key),))
+            .fetchone()
+        )
+        # written by this machine's own workers
+        return default if row is None else pickle.loads(row[0])  # noqa: S301
+
+    def put(self, name: str, key: Hashable, value: Any) -> None:
+        db = self._db()
+        db.execute(
+            "INSERT OR IGNORE INTO results VALUES (?, ?)",
+            (self._key(name, key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+        )
+        self.writes += 1
+        if self.writes % TRIM_EVERY == 0:
+            db.execute(
+                "DELETE FROM results WHERE rowid <= (SELECT MAX(rowid) FROM results) - ?",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        self._db().execute("DELETE FROM results")
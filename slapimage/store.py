@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from typing import TYPE_CHECKING, Any, Optional
+
+from slapimage.cache import cached
+from slapimage.metrics import font_names, font_path
+from slapimage.render import load_template
+from slapimage.utils import file_hash
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+def image_hash(img: Image) -> str:
+    """SHA-256 of an image's mode, size and pixels, so re-encoding the same pixels keeps the hash."""
+
+    h = hashlib.sha256(f"{img.mode} {img.width}x{img.height}\n".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+@cached("template_hashes", max_entries=32)
+def _template_hash(path: str, mtime_ns: int, size: int) -> str:
+    return image_hash(load_template(path))
+
+
+def template_hash(path: str) -> str:
+    """`image_hash` of a template, cached until the file's size or modification time changes."""
+
+    st = os.stat(path)
+    return _template_hash(path, st.st_mtime_ns, st.st_size)
+
+
+def _fonts(spec: dict[str, Any]) -> list[Any]:
+    """Fonts a field spec uses: its own and those of its rich text runs."""
+
+    fonts = [spec["font"]] if "font" in spec else []
+    if isinstance(spec.get("text"), list):
+        fonts += [r["font"] for r in spec["text"] if "font" in r]
+    return fonts
+
+
+def render_key(
+    fields: list[dict[str, Any]],
+    template: str,
+    record: dict[str, Any],
+    **options: Any,
+) -> str:
+    """
+    Content address of a rendered record.
+
+    Args:
+    - fields (`list[dict[str, Any]]`): compiled field specs, see `slapimage.render.compile_fields`
+    - template (`str`): hash of the template's pixels, see `image_hash`
+    - record (`dict[str, Any]`): record values
+    - options (`Any`): anything else that changes the output, e.g. scale and format
+
+    Returns:
+    `str`: hex digest that only changes when the rendered output would
+    """
+
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "fields": fields,
+                "template": template,
+                "fonts": {
+                    name: file_hash(font_path(name))
+                    for f in fields
+                    for font in _fonts(f)
+                    for name in font_names(font)
+                },
+                "images": {
+                    f["image"]: file_hash(f["image"]) for f in fields if "image" in f
+                },
+                "record": record,
+                "options": options,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        ).encode(),
+    ).hexdigest()
+
+
+class Store:
+    """
+    Content-addressed store of rendered outputs, laid out as `root/ab/cdef...ext` by `render_key`.
+
+    Outputs are added and handed out as hard links, falling back to copies across filesystems.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:] + ext)
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        p = self.path(key, ext)
+        return p if os.path.exists(p) else None
+
+    def put(self, key: str, src: str) -> None:
+        """Add the file at `src` to the store under `key`."""
+
+        dest = self.path(key, os.path.splitext(src)[1])
+        if os.path.exists(dest):
+            return
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        _link(src, dest)
+
+    def link(self, key: str, dest: str) -> bool:
+        """
+        Put the stored output for `key` at `dest`.
+
+        Returns:
+        `bool`: whether the store had the output
+        """
+
+        src = self.get(key, os.path.splitext(dest)[1])
+        if src is None:
+            return False
+        _link(src, dest)
+        return True
+
+
+def _link(src: str, dest: str) -> None:
+    """Atomically replace `dest` with a hard link to (or a copy of) `src`."""
+
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
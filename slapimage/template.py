@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+from typing import TYPE_CHECKING, Any, Optional
+
+from slapimage.utils import file_hash
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+MAGIC = b"SLAPRAW2"
+ALIGN = mmap.ALLOCATIONGRANULARITY
+
+
+def raw_path(path: str) -> str:
+    return path + ".raw"
+
+
+def prepare(path: str, img: Optional[Image] = None) -> str:
+    """
+    Write the prepared form of a template next to it: a small header with the mode, size, palette and source's hash, then the raw pixel data, page aligned.
+
+    Args:
+    - path (`str`): path to the template
+    - img (`Optional[Image]`): the template, already decoded
+
+    Returns:
+    `str`: path to the prepared template
+    """
+
+    if img is None:
+        from PIL import Image
+
+        img = Image.open(path)
+        img.load()
+
+    st = os.stat(path)
+    header = json.dumps(
+        {
+            "mode": img.mode,
+            "size": img.size,
+            "palette": img.getpalette() if img.mode == "P" else None,
+            "info": {
+                k: _dump_info(v)
+                for k, v in img.info.items()
+                if k in ("transparency", "dpi") and isinstance(v, int | tuple | bytes)
+            },
+            "source": {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha256": file_hash(path),
+            },
+        },
+    ).encode()
+    offset = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+
+    dest = raw_path(path)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(img.tobytes())
+    os.replace(tmp, dest)
+    return dest
+
+
+def _dump_info(value: int | tuple[Any, ...] | bytes) -> Any:
+    # JSON has no tuples nor bytes, e.g. the alpha of each palette entry
+    if isinstance(value, bytes):
+        return {"bytes": list(value)}
+    return value
+
+
+def _load_info(value: Any) -> int | tuple[Any, ...] | bytes:
+    if isinstance(value, dict):
+        return bytes(value["bytes"])
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def _header(mm: mmap.mmap) -> tuple[dict[str, Any], int]:
+    if mm[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a prepared template.")
+    (n,) = struct.unpack_from("<I", mm, len(MAGIC))
+    start = len(MAGIC) + 4
+    offset = -(-(start + n) // ALIGN) * ALIGN
+    return json.loads(mm[start : start + n]), offset
+
+
+def _fresh(header: dict[str, Any], path: str) -> bool:
+    """Whether the prepared template was made from the source as it is now."""
+
+    source = header["source"]
+    st = os.stat(path)
+    if (st.st_size, st.st_mtime_ns) == (source["size"], source["mtime_ns"]):
+        return True
+    return st.st_size == source["size"] and file_hash(path) == source["sha256"]
+
+
+def load_prepared(path: str) -> Optional[Image]:
+    """
+    Load the prepared form of a template with `mmap`, so processes loading the same template share its page-cache pages.
+
+    Returns:
+    `Optional[Image]`: the read-only template, or `None` if it is missing or stale
+    """
+
+    try:
+        with open(raw_path(path), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        header, offset = _header(mm)
+    except (ValueError, struct.error):
+        return None
+    if not _fresh(header, path):
+        return None
+
+    from PIL import Image
+
+    mode, size = header["mode"], tuple(header["size"])
+    # "L", "P", "RGBA" and the like are mapped without copying; other modes, e.g. "RGB", are unpacked into a copy, which is still far cheaper than decoding
+    img = Image.frombuffer(mode, size, memoryview(mm)[offset:], "raw", mode, 0, 1)
+    if header["palette"] is not None:
+        img.putpalette(header["palette"])
+    img.info.update({k: _load_info(v) for k, v in header["info"].items()})
+    return img
+
+
+def load(path: str) -> Image:
+    """
+    Load a template from its prepared form, preparing it first if it is missing or stale.
+
+    If the prepared form can't be written, e.g. on a read-only filesystem, the decoded template is used as is.
+    """
+
+    img = load_prepared(path)
+    if img is not None:
+        return img
+
+    from PIL import Image
+
+    img = Image.open(path)
+    img.load()
+    try:
+        prepare(path, img)
+    except OSError:
+        return img
+    return load_prepared(path) or img
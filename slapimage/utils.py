@@ -0,0 +1,24 @@
+import hashlib
+import os
+
+from slapimage.cache import cached
+
+
+def half_round(n: float | int) -> int:
+    return round(n / 2)
+
+
+@cached("file_hashes", max_entries=256)
+def _file_hash(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file, cached until the file's size or modification time changes."""
+
+    st = os.stat(path)
+    return _file_hash(path, st.st_mtime_ns, st.st_size)
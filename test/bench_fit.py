@@ -0,0 +1,151 @@
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from PIL import Image
+
+from slapimage.draw import ELLIPSIS, Draw, Fit, FitError, fit_text, measure_text
+
+FIELDS = 150
+FONT = "InterTight"
+# too long to fit its fields, even at the smallest size
+LONG = "Supercalifragilisticexpialidocious " * 4
+WORDS = "dance to your heart's desire in tune to this waltz of malice lest those who don't shall be damned".split()
+
+
+def descent(
+    text: str,
+    fw: int,
+    fh: int,
+    max_font_size: int,
+    multiline: bool,
+) -> Fit:
+    """The original fitting: walk down one size at a time from `max_font_size` until the text fits, clipping at size 1."""
+
+    for size in range(max_font_size, 0, -1):
+        fit = measure_text(FONT, text, fw, size, multiline)
+        if (fit.tw <= fw) and (fit.th <= fh):
+            return fit
+    return measure_text(FONT, text, fw, 1, multiline)
+
+
+def fields(seed: int = 0) -> list[tuple[str, int, int, int, bool]]:
+    rng = random.Random(seed)
+    result = []
+    for _ in range(FIELDS):
+        multiline = rng.random() < 0.5
+        words = rng.randint(1, 40 if multiline else 8)
+        text = " ".join(rng.choice(WORDS) for _ in range(words))
+        fw, fh = rng.randint(40, 800), rng.randint(20, 400 if multiline else 120)
+        result.append((text, fw, fh, rng.choice((40, 100, 300)), multiline))
+    return result
+
+
+def measured(fn: Callable[..., Fit], *args: Any) -> tuple[Fit, int, float]:
+    """Fit from a cold cache, returning the fit, the font sizes measured and the seconds taken."""
+
+    measure_text.cache_clear()
+    fit_text.cache_clear()
+    misses = measure_text.cache.misses
+    start = time.perf_counter()
+    fit = fn(*args)
+    return fit, measure_text.cache.misses - misses, time.perf_counter() - start
+
+
+def check() -> None:
+    probes = {"descent": 0, "fit_text": 0}
+    elapsed = {"descent": 0.0, "fit_text": 0.0}
+    for text, fw, fh, max_font_size, multiline in fields():
+        ref, n, t = measured(descent, text, fw, fh, max_font_size, multiline)
+        probes["descent"] += n
+        elapsed["descent"] += t
+        fit, n, t = measured(fit_text, FONT, text, fw, fh, max_font_size, multiline)
+        probes["fit_text"] += n
+        elapsed["fit_text"] += t
+        assert fit.size == ref.size, (text, fw, fh, max_font_size, fit.size, ref.size)
+        assert fit.lines == ref.lines, (text, fw, fh, max_font_size)
+
+    print(f"fit_text matches the descent on {FIELDS} random fields")
+    for name in probes:
+        print(
+            f"{name}: {probes[name] / FIELDS:.1f} sizes measured,"
+            f" {elapsed[name] / FIELDS * 1000:.2f}ms per field",
+        )
+
+
+def check_limits() -> None:
+    # nothing fits at min_font_size: every fallback applies there
+    args = (FONT, LONG, 120, 30, 100, False, 1, "bbox", 12)
+    fit = fit_text(*args, fallback="clip")
+    assert (fit.size, fit.event, fit.text) == (12, "min_size", None), fit
+    assert fit.tw > 120, fit
+    fit = fit_text(*args, fallback="truncate")
+    assert (fit.size, fit.event) == (12, "min_size"), fit
+    assert fit.text is not None and fit.text.endswith(ELLIPSIS), fit
+    assert fit.tw <= 120 and fit.th <= 30, fit
+    try:
+        fit_text(*args, fallback="error")
+    except FitError:
+        pass
+    else:
+        raise AssertionError("fallback error did not raise")
+
+    # the search runs out of probes before anything fits
+    fit = fit_text(FONT, LONG, 400, 60, 100, False, max_iterations=1)
+    assert (fit.size, fit.event) == (1, "iterations"), fit
+
+    # or out of time, which isn't cached, as next time it may not
+    entries = fit_text.cache.stats()["entries"]
+    fit = fit_text(FONT, LONG, 400, 60, 100, False, time_budget=0)
+    assert fit.event == "time", fit
+    assert fit_text.cache.stats()["entries"] == entries
+
+    # text that fits hits no limit
+    fit = fit_text(
+        FONT,
+        "Juan",
+        400,
+        60,
+        100,
+        False,
+        min_font_size=12,
+        max_iterations=3,
+        time_budget=1.0,
+        fallback="error",
+    )
+    assert fit.event is None, fit
+
+    # the limits hit are in the drawing's events, for single fields and groups
+    spec = {
+        "type_coords_tuple": ("xyxy", 0, 0, 120, 30),
+        "anchor": "lm",
+        "font": FONT,
+        "fill": "black",
+        "min_font_size": 12,
+        "fallback": "truncate",
+    }
+    draw = Draw(Image.new("RGB", (400, 100), "white"))
+    draw.text(text=LONG, **spec)
+    assert [e["event"] for e in draw.events] == ["min_size"], draw.events
+    draw = Draw(Image.new("RGB", (400, 100), "white"))
+    draw.text_group([{"text": "Juan", **spec}, {"text": LONG, **spec}])
+    assert [(e["text"], e["event"]) for e in draw.events] == [
+        (LONG.strip(), "min_size"),
+    ], draw.events
+    try:
+        draw.text_group([{"text": LONG, **spec, "fallback": "error"}])
+    except FitError:
+        pass
+    else:
+        raise AssertionError("group fallback error did not raise")
+    print("every fallback and fitting event checks out")
+
+
+def main() -> None:
+    check_limits()
+    check()
+
+
+if __name__ == "__main__":
+    main()
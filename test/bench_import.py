@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+RUNS = 5
+
+# cumulative import time budget of each entry point, in milliseconds
+BUDGETS = {
+    "slapimage.draw": 30,
+    "slapimage.render": 35,
+    "slapimage.batch": 50,
+    "slapimage.preflight": 60,
+    "slapimage.service": 60,
+}
+
+# loaded on first use only
+LAZY = ("PIL", "yaml", "whinesnips")
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Cumulative import time of every module imported by `import module` in a fresh interpreter, from `python -X importtime`.
+
+    Returns:
+    `dict[str, int]`: microseconds per module name
+    """
+
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    over = []
+    for module, budget in BUDGETS.items():
+        runs = [import_times(module) for _ in range(RUNS)]
+        ms = min(times[module] for times in runs) / 1000
+        eager = sorted(
+            {name for name in runs[0] if name.split(".")[0] in LAZY},
+        )
+
+        status = "ok"
+        if ms > budget or eager:
+            status = "OVER"
+            over.append(module)
+        print(f"{module}: {ms:.1f}ms / {budget}ms {status}")
+        if eager:
+            print(f"  eagerly imports {', '.join(eager)}")
+
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
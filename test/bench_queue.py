@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from slapimage.jobs import SQLiteQueue
+
+JOBS = 5000
+WORKERS = 4
+
+
+def drain(path: str, batch: int) -> int:
+    queue = SQLiteQueue(path)
+    done = 0
+    while jobs := queue.lease(batch):
+        for job in jobs:
+            queue.ack(job, {"id": job.payload["id"]})
+        done += len(jobs)
+    return done
+
+
+def bench(batch: int, workers: int = 1) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "queue.db")
+        queue = SQLiteQueue(path)
+        queue.put({"id": i, "name": f"Record {i}"} for i in range(JOBS))
+
+        start = time.perf_counter()
+        if workers == 1:
+            done = drain(path, batch)
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                done = sum(executor.map(drain, [path] * workers, [batch] * workers))
+        elapsed = time.perf_counter() - start
+
+        assert done == JOBS, done
+        assert queue.stats()["done"] == JOBS, queue.stats()
+
+    rate = JOBS / elapsed
+    print(f"lease + ack, batch {batch}, {workers} worker(s): {rate:,.0f} jobs/s")
+    return rate
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteQueue(os.path.join(tmp, "queue.db"))
+        start = time.perf_counter()
+        queue.put({"id": i, "name": f"Record {i}"} for i in range(JOBS))
+        print(f"put: {JOBS / (time.perf_counter() - start):,.0f} jobs/s")
+
+    for batch in (1, 8, 32):
+        bench(batch)
+    bench(8, WORKERS)
+
+
+if __name__ == "__main__":
+    main()
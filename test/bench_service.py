@@ -0,0 +1,91 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from whinesnips.utils.utils import fn
+
+from slapimage.client import AsyncClient
+
+REQUESTS = 200
+CONCURRENCY = 16
+
+TEMPLATE = fn("../assets/images/test-tpl.png")
+FIELDS = [
+    {
+        "type_coords_tuple": ["xyxy", 25, 25, 475, 75],
+        "text": "{name}",
+        "font": "InterTight",
+        "fill": "black",
+        "anchor": "mm",
+        "max_font_size": 30,
+    },
+    {
+        "type_coords_tuple": ["xyxy", 25, 190, 475, 475],
+        "text": "{body}",
+        "font": "InterTight",
+        "fill": "black",
+        "anchor": "mmm",
+        "breaktext": True,
+        "line_height": 1.5,
+        "max_font_size": 30,
+    },
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+
+
+async def load(socket: str) -> list[float]:
+    client = AsyncClient(socket)
+    sem = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(i: int) -> None:
+        record = {
+            "name": f"Record {i % 50}",
+            "body": "Dance to your heart's desire in tune to this waltz " * (i % 3 + 1),
+        }
+        async with sem:
+            start = time.perf_counter()
+            await client.render(TEMPLATE, FIELDS, record)
+            latencies.append(time.perf_counter() - start)
+
+    while True:
+        try:
+            await client.http.get("/health")
+            break
+        except Exception:  # noqa: BLE001
+            await asyncio.sleep(0.1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    print(f"{REQUESTS} requests in {elapsed:.2f}s ({REQUESTS / elapsed:.1f}/s)")
+    print(await client.stats())
+    await client.aclose()
+    return latencies
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        socket = os.path.join(tmp, "slapimage.sock")
+        service = subprocess.Popen(
+            [sys.executable, "-m", "slapimage.service", "--socket", socket],
+        )
+        try:
+            latencies = asyncio.run(load(socket))
+        finally:
+            service.terminate()
+            service.wait()
+
+    print(f"p50: {percentile(latencies, 50) * 1000:.1f}ms")
+    print(f"p99: {percentile(latencies, 99) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import time
+from typing import Any, Optional
+
+from PIL import Image
+
+from slapimage.draw import Draw
+
+RUNS = 10
+
+FIELDS: list[dict[str, Any]] = [
+    {
+        "type_coords_tuple": ("xyxy", 50, 50 + 240 * i, 1950, 270 + 240 * i),
+        "text": f"Field {i}: Dance to your heart's desire in tune to this waltz of malice, lest those who don't shall be damned!",
+        "font": "InterTight",
+        "fill": "black",
+        "anchor": "mmm",
+        "breaktext": True,
+        "max_font_size": 120,
+        "shadow": {"offset": [4, 4], "blur": 4} if i % 2 else None,
+    }
+    for i in range(8)
+]
+
+
+def bench(name: str, workers: Optional[int] = None) -> float:
+    template = Image.new("RGB", (2000, 2000), "white")
+    # fit once, as a batch would, and start the pool
+    Draw(template.copy()).texts(FIELDS, workers or 1)
+
+    elapsed = 0.0
+    for _ in range(RUNS):
+        draw = Draw(template.copy())
+        start = time.perf_counter()
+        if workers is None:
+            for spec in FIELDS:
+                draw.text(**spec)
+        else:
+            draw.texts(FIELDS, workers)
+        elapsed += time.perf_counter() - start
+
+    ms = elapsed / RUNS * 1000
+    print(f"{name}: {ms:.1f}ms per {len(FIELDS)} fields")
+    return ms
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    print(f"{cpus} CPU(s)")
+    sequential = bench("Draw.text, one after another")
+    bench("Draw.texts, in this process", 1)
+    for workers in sorted({2, 4, cpus}):
+        ms = bench(f"Draw.texts, {workers} processes", workers)
+        print(f"  {sequential / ms:.2f}x Draw.text")
+
+
+if __name__ == "__main__":
+    main()
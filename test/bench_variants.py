@@ -0,0 +1,111 @@
+import time
+from typing import Any
+
+from PIL import Image, ImageChops
+
+from slapimage.render import render, render_variants
+
+RUNS = 20
+MODES = ("RGB", "RGBA", "L", "LA", "P")
+
+FIELDS: list[dict[str, Any]] = [
+    {
+        "type_coords_tuple": ("xyxy", 25, 25, 475, 75),
+        "text": "{name}",
+        "font": "InterTight",
+        "fill": "black",
+        "anchor": "mm",
+        "max_font_size": 40,
+        "shadow": {"offset": [3, 3], "blur": 3},
+    },
+    {
+        "type_coords_tuple": ("xyxy", 25, 90, 475, 140),
+        "text": "{title}",
+        "font": "InterTight",
+        "fill": "white",
+        "anchor": "la",
+        "inverted": True,
+        "max_font_size": 30,
+        "stroke_width": 2,
+        "stroke_fill": "black",
+    },
+    {
+        "type_coords_tuple": ("xyxy", 25, 160, 475, 375),
+        "text": "Dance to your heart's desire, {name}, in tune to this waltz of malice!",
+        "font": "InterTight",
+        "fill": "#00000099",
+        "anchor": "mmm",
+        "breaktext": True,
+        "max_font_size": 40,
+    },
+]
+
+
+def shift(fields: list[dict[str, Any]], dx: int, dy: int) -> list[dict[str, Any]]:
+    result = []
+    for spec in fields:
+        t, x1, y1, x2, y2 = spec["type_coords_tuple"]
+        result.append(
+            {**spec, "type_coords_tuple": (t, x1 + dx, y1 + dy, x2 + dx, y2 + dy)},
+        )
+    return result
+
+
+def variants(mode: str) -> list[tuple[Image.Image, list[dict[str, Any]]]]:
+    square = Image.new("RGBA", (500, 400), (200, 180, 40, 255))
+    square.paste((40, 80, 160, 255), (0, 0, 250, 400))
+    if mode == "P":
+        square = square.convert("RGB").quantize(16)
+    else:
+        square = square.convert(mode)
+    return [
+        (square, FIELDS),
+        (square.resize((700, 400)), shift(FIELDS, 100, 0)),
+        (square.crop((0, 0, 500, 200)), FIELDS[:2]),
+    ]
+
+
+def check(mode: str) -> None:
+    record = {"name": "Juan Dela Cruz", "title": "CEO"}
+    for (template, fields), out in zip(
+        variants(mode),
+        render_variants(variants(mode), record),
+        strict=True,
+    ):
+        ref = render(template, fields, record)
+        assert out.mode == ref.mode, (mode, out.mode, ref.mode)
+        diff = ImageChops.difference(out.convert("RGBA"), ref.convert("RGBA"))
+        assert diff.getbbox() is None, (mode, diff.getbbox())
+
+
+def bench(mode: str) -> None:
+    vs = variants(mode)
+    elapsed = {"separate": 0.0, "variants": 0.0}
+    for i in range(RUNS):
+        record = {"name": f"Record {i}", "title": "CEO"}
+        start = time.perf_counter()
+        for template, fields in vs:
+            render(template, fields, record)
+        elapsed["separate"] += time.perf_counter() - start
+
+        record = {"name": f"Variant {i}", "title": "CEO"}
+        start = time.perf_counter()
+        render_variants(vs, record)
+        elapsed["variants"] += time.perf_counter() - start
+
+    print(
+        f"{mode}: {elapsed['separate'] / RUNS * 1000:.1f}ms separately,"
+        f" {elapsed['variants'] / RUNS * 1000:.1f}ms as variants",
+    )
+
+
+def main() -> None:
+    for mode in MODES:
+        check(mode)
+    print("variant output matches render in every mode")
+    for mode in MODES:
+        bench(mode)
+
+
+if __name__ == "__main__":
+    main()